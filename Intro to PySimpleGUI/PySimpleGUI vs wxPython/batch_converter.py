@@ -0,0 +1,211 @@
+# batch_converter.py
+
+"""
+Apply effects to every image in a folder using a pool of processes
+
+Each worker decodes a file once, applies every selected effect and
+writes the results itself, so only file names and small status records
+travel between processes. A manifest in the output folder records every
+finished file with its modification time and the output settings, and
+a rerun skips the ones already done with the same settings:
+
+    python batch_converter.py photos converted --effect Sepia --effect Grayscale
+    python batch_converter.py photos converted --effect Sepia --max-size 1024 --format png
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from effects import effects, open_image, save_image
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp"}
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def find_images(folder, recursive=False):
+    """
+    Return the paths of the images in a folder, relative to it, in order
+    """
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                paths.append(os.path.relpath(os.path.join(root, name), folder))
+        if not recursive:
+            break
+    return paths
+
+
+def output_name(source, effect, extension):
+    stem = os.path.splitext(source)[0]
+    slug = effect.lower().replace(" ", "_")
+    return f"{stem}_{slug}.{extension}"
+
+
+def output_settings(extension, max_size, quality):
+    return {"format": extension, "max_size": max_size, "quality": quality}
+
+
+def convert_file(input_dir, output_dir, source, effect_names, extension,
+                 max_size=None, quality=90):
+    """
+    Decode one image and write it once per effect, in a worker process
+
+    Any error is reported in the returned record instead of raised, so
+    one bad file doesn't stop the batch
+    """
+    start = time.perf_counter()
+    record = {"source": source, "effects": effect_names,
+              "settings": output_settings(extension, max_size, quality)}
+    try:
+        record["mtime_ns"] = os.stat(os.path.join(input_dir, source)).st_mtime_ns
+        image = open_image(os.path.join(input_dir, source), max_size)
+        for effect in effect_names:
+            path = os.path.join(output_dir, output_name(source, effect, extension))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            save_image(effects[effect](image), path, quality=quality)
+    except Exception as error:
+        record["error"] = f"{type(error).__name__}: {error}"
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def load_manifest(path, settings):
+    """
+    Map the (source, effect) pairs that finished without an error using
+    these output settings to the modification time of the source
+    """
+    done = {}
+    try:
+        with open(path, encoding="utf-8") as manifest:
+            for line in manifest:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short when the last run was interrupted
+                    continue
+                if "error" not in record and record.get("settings") == settings:
+                    for effect in record["effects"]:
+                        done[record["source"], effect] = record["mtime_ns"]
+    except OSError:
+        pass
+    return done
+
+
+def format_eta(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def run_batch(input_dir, output_dir, effect_names, extension="jpg", max_size=None,
+              quality=90, workers=None, recursive=False, restart=False,
+              progress=None, should_stop=None):
+    """
+    Convert a folder of images and return a summary dict
+
+    progress(done, total, failed, elapsed) is called after every file.
+    should_stop() is checked between files so a GUI can cancel the run
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    settings = output_settings(extension, max_size, quality)
+    done_pairs = {} if restart else load_manifest(manifest_path, settings)
+
+    sources = find_images(input_dir, recursive)
+    tasks = []
+    for source in sources:
+        try:
+            mtime = os.stat(os.path.join(input_dir, source)).st_mtime_ns
+        except OSError:
+            mtime = None
+        todo = [effect for effect in effect_names
+                if mtime is None or done_pairs.get((source, effect)) != mtime]
+        if todo:
+            tasks.append((source, todo))
+    skipped = len(sources) - len(tasks)
+
+    workers = workers or os.cpu_count() or 1
+    # Only a few files per worker are queued at once, which bounds the
+    # memory used no matter how large the folder is
+    max_pending = workers * 2
+    total = len(tasks)
+    finished = failed = 0
+    start = time.perf_counter()
+
+    with open(manifest_path, "w" if restart else "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        remaining = iter(tasks)
+        stopped = False
+        while True:
+            while not stopped and len(pending) < max_pending:
+                task = next(remaining, None)
+                if task is None:
+                    break
+                source, todo = task
+                pending.add(executor.submit(convert_file, input_dir, output_dir, source,
+                                            todo, extension, max_size, quality))
+            if not pending:
+                break
+            completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                record = future.result()
+                manifest.write(json.dumps(record) + "\n")
+                finished += 1
+                failed += "error" in record
+            manifest.flush()
+            if progress is not None:
+                progress(finished, total, failed, time.perf_counter() - start)
+            if should_stop is not None and should_stop():
+                stopped = True
+
+    elapsed = time.perf_counter() - start
+    return {"total": total, "done": finished, "failed": failed, "skipped": skipped,
+            "seconds": elapsed, "files_per_second": finished / max(elapsed, 1e-9),
+            "manifest": manifest_path}
+
+
+def progress_text(done, total, failed, elapsed):
+    rate = done / max(elapsed, 1e-9)
+    eta = (total - done) / rate if rate else 0
+    return f"{done}/{total} files, {failed} failed, {rate:.1f} files/s, ETA {format_eta(eta)}"
+
+
+def print_progress(done, total, failed, elapsed):
+    print(f"\r{progress_text(done, total, failed, elapsed)}", end="", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply effects to a folder of images")
+    parser.add_argument("input", help="folder of images")
+    parser.add_argument("output", help="folder for the converted images and the manifest")
+    parser.add_argument("--effect", action="append", choices=list(effects),
+                        help="effect to apply, can be given more than once (default Sepia)")
+    parser.add_argument("--format", default="jpg", choices=["jpg", "png", "webp"],
+                        help="format of the converted images")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality")
+    parser.add_argument("--max-size", type=int, help="scale images down to fit this size")
+    parser.add_argument("--workers", type=int, help="processes to use, default one per CPU")
+    parser.add_argument("--recursive", action="store_true", help="include subfolders")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the manifest and convert everything again")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output, args.effect or ["Sepia"], args.format,
+                        args.max_size, args.quality, args.workers, args.recursive,
+                        args.restart, progress=print_progress)
+    print(file=sys.stderr)
+    print(f"{summary['done']} files in {summary['seconds']:.1f}s "
+          f"({summary['files_per_second']:.1f} files/s), {summary['failed']} failed, "
+          f"{summary['skipped']} already done", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
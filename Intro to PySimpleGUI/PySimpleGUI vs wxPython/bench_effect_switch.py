@@ -0,0 +1,49 @@
+# bench_effect_switch.py
+
+"""
+Time an effect switch with temp files and with the in-memory pipeline
+
+    python bench_effect_switch.py ../../"Image Processing"/*.jpg
+"""
+
+import io
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from effects import effects, open_image, preview_data
+
+
+def temp_file_switch(path, effect, tmp_file):
+    # What the converter used to do: decode, apply, write, decode again, PNG
+    effects[effect](open_image(path)).save(tmp_file, format="JPEG")
+    image = Image.open(tmp_file)
+    image.thumbnail((400, 400))
+    bio = io.BytesIO()
+    image.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def in_memory_switch(original, effect):
+    return preview_data(effects[effect](original))
+
+
+def main(paths):
+    tmp_file = tempfile.NamedTemporaryFile(suffix=".jpg").name
+    for path in paths:
+        original = open_image(path)
+        print(f"{path} ({original.width}x{original.height})")
+        for effect in effects:
+            start = time.perf_counter()
+            temp_file_switch(path, effect, tmp_file)
+            middle = time.perf_counter()
+            in_memory_switch(original, effect)
+            end = time.perf_counter()
+            print(f"  {effect:16} temp file {(middle - start) * 1000:7.1f} ms   "
+                  f"in memory {(end - middle) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
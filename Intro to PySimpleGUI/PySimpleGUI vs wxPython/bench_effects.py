@@ -0,0 +1,106 @@
+# bench_effects.py
+
+"""
+Compare the NumPy effects with the usual getpixel/putpixel recipes
+
+The per-pixel versions take seconds per photo, so by default every
+image is scaled down to at most 800 pixels first. Use --max-size 0
+to run on the full images.
+
+    python bench_effects.py
+    python bench_effects.py --max-size 0 ../../"Image Processing"/flowers.jpg
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from effects import black_and_white, grayscale, open_image, sepia
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       "..", "..", "Image Processing")
+
+
+def reference_grayscale(image):
+    result = Image.new("L", image.size)
+    for y in range(image.height):
+        for x in range(image.width):
+            r, g, b = image.getpixel((x, y))
+            result.putpixel((x, y), int(r * 0.299 + g * 0.587 + b * 0.114 + 0.5))
+    return result
+
+
+def reference_black_and_white(image, threshold=128):
+    result = Image.new("L", image.size)
+    for y in range(image.height):
+        for x in range(image.width):
+            r, g, b = image.getpixel((x, y))
+            gray = int(r * 0.299 + g * 0.587 + b * 0.114 + 0.5)
+            result.putpixel((x, y), 255 if gray >= threshold else 0)
+    return result
+
+
+def reference_sepia(image):
+    result = Image.new("RGB", image.size)
+    for y in range(image.height):
+        for x in range(image.width):
+            r, g, b = image.getpixel((x, y))
+            result.putpixel((x, y), (
+                int(min(r * 0.393 + g * 0.769 + b * 0.189, 255) + 0.5),
+                int(min(r * 0.349 + g * 0.686 + b * 0.168, 255) + 0.5),
+                int(min(r * 0.272 + g * 0.534 + b * 0.131, 255) + 0.5),
+            ))
+    return result
+
+
+PAIRS = [
+    ("Grayscale", grayscale, reference_grayscale),
+    ("Black and White", black_and_white, reference_black_and_white),
+    ("Sepia", sepia, reference_sepia),
+]
+
+
+def timed(effect, image):
+    start = time.perf_counter()
+    result = effect(image)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="images, default the Image Processing samples")
+    parser.add_argument("--max-size", type=int, default=800,
+                        help="scale images down to this many pixels, 0 for full size")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(SAMPLES, "*.jp*g"))
+                                 + glob.glob(os.path.join(SAMPLES, "*.JPG")))
+    totals = {name: [0.0, 0.0] for name, _, _ in PAIRS}
+    for path in paths:
+        image = open_image(path)
+        if args.max_size:
+            image.thumbnail((args.max_size, args.max_size))
+        print(f"{os.path.basename(path)} ({image.width}x{image.height})")
+        for name, effect, reference in PAIRS:
+            fast, fast_time = timed(effect, image)
+            slow, slow_time = timed(reference, image)
+            difference = np.abs(np.asarray(fast, dtype=np.int16)
+                                - np.asarray(slow, dtype=np.int16)).max()
+            totals[name][0] += fast_time
+            totals[name][1] += slow_time
+            print(f"  {name:16} numpy {fast_time * 1000:8.1f} ms   "
+                  f"per pixel {slow_time * 1000:9.1f} ms   "
+                  f"{slow_time / fast_time:6.0f}x   max difference {difference}")
+
+    print("Total")
+    for name, (fast_time, slow_time) in totals.items():
+        print(f"  {name:16} numpy {fast_time:6.2f} s   per pixel {slow_time:7.2f} s   "
+              f"{slow_time / fast_time:6.0f}x")
+
+
+if __name__ == "__main__":
+    main()
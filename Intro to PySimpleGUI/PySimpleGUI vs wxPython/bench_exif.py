@@ -0,0 +1,82 @@
+# bench_exif.py
+
+"""
+Compare reading EXIF with Pillow's _getexif() and with exif_reader
+
+    python bench_exif.py
+    python bench_exif.py --repeat 50 photos/*.jpg
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+from exif_index import ExifIndex
+from exif_reader import read_exif
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       "..", "..", "Image Processing")
+
+# The tags the viewers show
+VIEWER_TAGS = {"Model", "ExifImageWidth", "ExifImageHeight", "DateTime", "MaxApertureValue",
+               "ExposureTime", "FNumber", "Flash", "FocalLength", "ISOSpeedRatings",
+               "ShutterSpeedValue"}
+
+
+def pillow_exif(path):
+    # What the viewers used to do
+    with Image.open(path) as image:
+        info = image._getexif() or {}
+    return {TAGS.get(tag, tag): value for tag, value in info.items()}
+
+
+def timed(function, paths, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            function(path)
+    return (time.perf_counter() - start) / (repeat * len(paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="photos, default the Image Processing samples")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    paths = args.paths or sorted(glob.glob(os.path.join(SAMPLES, "*.jp*g"))
+                                 + glob.glob(os.path.join(SAMPLES, "*.JPG")))
+
+    # Both must find the same values for the tags the viewer shows
+    for path in paths:
+        expected = pillow_exif(path)
+        found = read_exif(path, tags=VIEWER_TAGS)
+        for tag, value in found.items():
+            if isinstance(value, float):
+                different = abs(float(expected[tag]) - value) > 1e-9
+            else:
+                different = expected[tag] != value
+            if different:
+                print(f"{path}: {tag} is {expected[tag]!r} in Pillow, {value!r} here")
+
+    pillow = timed(pillow_exif, paths, args.repeat)
+    reader = timed(lambda path: read_exif(path, tags=VIEWER_TAGS), paths, args.repeat)
+    with tempfile.TemporaryDirectory() as folder:
+        index = ExifIndex(os.path.join(folder, "metadata.sqlite"))
+        for path in paths:
+            index.get(path)
+        cached = timed(index.get, paths, args.repeat)
+        index.close()
+
+    print(f"{len(paths)} photos, {args.repeat} times each")
+    print(f"  Pillow _getexif()   {pillow * 1e6:8.1f} us per photo")
+    print(f"  exif_reader         {reader * 1e6:8.1f} us per photo  {pillow / reader:5.1f}x")
+    print(f"  SQLite index hit    {cached * 1e6:8.1f} us per photo  {pillow / cached:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
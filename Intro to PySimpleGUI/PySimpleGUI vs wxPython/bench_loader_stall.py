@@ -0,0 +1,136 @@
+# bench_loader_stall.py
+
+"""
+Measure how long the wx event loop stalls while large images load
+
+A timer ticks every 5 ms and records the longest gap between ticks.
+The same large JPEGs are shown in the image viewer twice: decoded on
+the GUI thread like the viewer used to, then through the ImageLoader.
+
+    python bench_loader_stall.py
+    python bench_loader_stall.py --size 8000x6000 --count 5
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import wx
+from PIL import Image
+
+from image_loader import scaled_image
+from image_viewer_wx import ImagePanel
+
+TICK_MS = 5
+
+
+def make_images(folder, count, width, height):
+    """
+    Write noisy gradient JPEGs, which compress about as well as photos
+    """
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 200, width, dtype=np.float32)
+    paths = []
+    for index in range(count):
+        pixels = rng.integers(0, 55, size=(height, width, 3), dtype=np.uint8)
+        pixels += gradient.astype(np.uint8)[None, :, None]
+        path = os.path.join(folder, f"large_{index}.jpg")
+        Image.fromarray(pixels, "RGB").save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+class StallFrame(wx.Frame):
+
+    def __init__(self, paths, background, on_finished):
+        super().__init__(None, title="Loader stall test")
+        self.on_finished = on_finished
+        self.panel = ImagePanel(self, image_size=(240, 240))
+        self.paths = list(paths)
+        self.background = background
+        self.gaps = []
+        self.last_tick = time.perf_counter()
+        self.start = None
+
+        # Every finished load starts the next one
+        show_image = self.panel.show_image
+
+        def show_and_continue(image, error):
+            show_image(image, error)
+            wx.CallLater(50, self.load_next)
+
+        self.panel.show_image = show_and_continue
+
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_tick, self.timer)
+        self.timer.Start(TICK_MS)
+        self.Show()
+        wx.CallLater(200, self.load_next)
+
+    def on_tick(self, event):
+        now = time.perf_counter()
+        if self.start is not None:
+            self.gaps.append(now - self.last_tick)
+        self.last_tick = now
+
+    def load_next(self):
+        if self.start is None:
+            self.start = time.perf_counter()
+        if not self.paths:
+            self.timer.Stop()
+            self.Destroy()
+            self.on_finished(self.gaps)
+            return
+        path = self.paths.pop(0)
+        if self.background:
+            self.panel.photo_txt.SetValue(path)
+            self.panel.load_image()
+        else:
+            # What the viewer did before: decode and scale on the GUI thread
+            self.panel.show_image(scaled_image(path, self.panel.max_size), None)
+
+
+def report(background, gaps):
+    gaps = gaps or [0.0]
+    mode = "background" if background else "GUI thread"
+    print(f"{mode:10}  worst stall {max(gaps) * 1000:7.1f} ms   "
+          f"mean tick {sum(gaps) / len(gaps) * 1000:5.1f} ms   ({len(gaps)} ticks)")
+
+
+def measure(paths):
+    """
+    Run the GUI thread and the background loads one after the other
+    """
+    app = wx.App(redirect=False)
+    app.SetExitOnFrameDelete(False)
+    modes = [False, True]
+
+    def run_next(gaps=None):
+        if gaps is not None:
+            report(modes.pop(0), gaps)
+        if modes:
+            StallFrame(paths, modes[0], lambda gaps: wx.CallAfter(run_next, gaps))
+        else:
+            app.ExitMainLoop()
+
+    run_next()
+    app.MainLoop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="6000x4000", help="image size, WIDTHxHEIGHT")
+    parser.add_argument("--count", type=int, default=3, help="number of images to load")
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"Writing {args.count} {width}x{height} JPEGs...")
+        paths = make_images(folder, args.count, width, height)
+        measure(paths)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# effect_chain.py
+
+"""
+Chains of effects with the intermediate images kept in memory
+
+A chain is a list of steps, each one a node name and its parameters:
+
+    chain = [step("Grayscale"), step("Contrast", factor=1.5), step("Resize", size=800)]
+    result = cache.render(image, chain)
+
+Every intermediate result is remembered under the source image, the
+steps that led to it and their parameters. Changing the last step of
+a chain therefore only reruns that step.
+"""
+
+import hashlib
+import os
+
+from collections import OrderedDict, namedtuple
+
+from PIL import ImageEnhance
+
+from effects import black_and_white, grayscale, normal, sepia
+
+Step = namedtuple("Step", ["name", "params"])
+
+
+def step(name, **params):
+    # Sorted so the same parameters always make the same key
+    return Step(name, tuple(sorted(params.items())))
+
+
+def contrast(image, factor=1.0):
+    return ImageEnhance.Contrast(image).enhance(factor)
+
+
+def color(image, factor=1.0):
+    return ImageEnhance.Color(image).enhance(factor)
+
+
+def brightness(image, factor=1.0):
+    return ImageEnhance.Brightness(image).enhance(factor)
+
+
+def sharpness(image, factor=1.0):
+    return ImageEnhance.Sharpness(image).enhance(factor)
+
+
+def resize(image, size=800):
+    """
+    Scale the image down to fit in a size x size square
+    """
+    resized = image.copy()
+    resized.thumbnail((size, size))
+    return resized
+
+
+nodes = {
+    "Normal": normal,
+    "Black and White": black_and_white,
+    "Grayscale": grayscale,
+    "Sepia": sepia,
+    "Contrast": contrast,
+    "Color": color,
+    "Brightness": brightness,
+    "Sharpness": sharpness,
+    "Resize": resize,
+}
+
+
+def image_key(image):
+    """
+    A hash of the pixels, for images that didn't come from a file
+    """
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    digest.update(f"{image.mode}{image.size}".encode())
+    return digest.hexdigest()
+
+
+def file_key(path):
+    """
+    A cheap stand-in for hashing a decoded file
+    """
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def image_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+class ChainCache:
+    """
+    Render chains of steps, keeping the most recent intermediate images
+
+    Entries are dropped least recently used first once the images in
+    the cache add up to more than max_bytes
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.steps_run = 0
+
+    def render(self, source, chain, source_key=None):
+        """
+        Return the source image with every step of the chain applied
+        """
+        if source_key is None:
+            source_key = image_key(source)
+        chain = tuple(chain)
+
+        # Start from the longest prefix of the chain already rendered
+        image = source
+        start = 0
+        for length in range(len(chain), 0, -1):
+            key = (source_key, chain[:length])
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                image = self.entries[key]
+                start = length
+                self.hits += 1
+                break
+
+        for length in range(start + 1, len(chain) + 1):
+            name, params = chain[length - 1]
+            image = nodes[name](image, **dict(params))
+            self.steps_run += 1
+            self.put((source_key, chain[:length]), image)
+        return image
+
+    def put(self, key, image):
+        self.entries[key] = image
+        self.size += image_bytes(image)
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, dropped = self.entries.popitem(last=False)
+            self.size -= image_bytes(dropped)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return (f"{len(self.entries)} images, {self.size / (1024 * 1024):.0f} MB, "
+                f"{self.hits} hits, {self.steps_run} steps run")
@@ -0,0 +1,146 @@
+# effects.py
+
+"""
+Photo effects that work on decoded Pillow images instead of file paths
+
+Every effect takes an RGB image and returns a new image, so the
+original can be decoded once and kept around while the user tries
+out different effects. The pixels are processed as NumPy arrays, a
+whole image per operation instead of a Python call per pixel.
+"""
+
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# ITU-R 601-2 luma weights, the same ones Pillow uses for "L"
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# The classic sepia tone matrix, one row per output channel
+SEPIA = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131],
+], dtype=np.float32)
+
+
+def as_array(image):
+    """
+    The pixels of an RGB image as a height x width x 3 uint8 array
+
+    Pillow doesn't share its pixel memory, so this is a copy of the
+    image, one byte per channel. Each effect makes it once per call.
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+def gray_image(gray):
+    """
+    Wrap a uint8 array as an "L" image without copying the pixels
+    """
+    gray = np.ascontiguousarray(gray, dtype=np.uint8)
+    height, width = gray.shape
+    return Image.frombuffer("L", (width, height), gray, "raw", "L", 0, 1)
+
+
+def luminance(image):
+    # uint8 @ float32 stays float32, about half the memory of float64
+    gray = as_array(image) @ LUMA
+    gray += 0.5
+    return gray
+
+
+def normal(image):
+    return image
+
+
+def grayscale(image):
+    return gray_image(luminance(image).astype(np.uint8))
+
+
+def black_and_white(image, threshold=128):
+    gray = luminance(image).astype(np.uint8)
+    # True * 255 is 255, so the mask becomes the image in place
+    np.greater_equal(gray, threshold, out=gray, casting="unsafe")
+    gray *= 255
+    return gray_image(gray)
+
+
+def sepia(image):
+    toned = as_array(image) @ SEPIA.T
+    np.minimum(toned, 255, out=toned)
+    toned += 0.5
+    return Image.fromarray(toned.astype(np.uint8), "RGB")
+
+
+effects = {
+    "Normal": normal,
+    "Black and White": black_and_white,
+    "Grayscale": grayscale,
+    "Sepia": sepia,
+}
+
+
+def open_image(path, max_size=None):
+    """
+    Decode an image file once, fully, as RGB
+
+    With max_size the image is scaled down to fit in a square of that
+    size, letting the JPEG decoder skip the detail that would be lost
+    """
+    with Image.open(path) as image:
+        if max_size:
+            image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
+    if max_size:
+        image.thumbnail((max_size, max_size))
+    return image
+
+
+def render_in_strips(image, effect, strip_height=256, progress=None):
+    """
+    Apply an effect to a large image one band of rows at a time
+
+    The effects only look at one pixel at a time, so the result is the
+    same as effect(image). progress(done, total) is called after each band
+    """
+    total = image.height
+    result = None
+    for top in range(0, total, strip_height):
+        bottom = min(top + strip_height, total)
+        strip = effect(image.crop((0, top, image.width, bottom)))
+        if result is None:
+            result = Image.new(strip.mode, image.size)
+        result.paste(strip, (0, top))
+        if progress is not None:
+            progress(bottom, total)
+    return result
+
+
+def save_image(image, path, **options):
+    """
+    Write an image to disk, as JPEG when the path has no known extension
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in Image.registered_extensions():
+        image.save(path, format="JPEG", **options)
+    else:
+        image.save(path, **options)
+
+
+def preview_data(image, size=(400, 400)):
+    """
+    Scale an in-memory image down and encode it for sg.Image
+
+    PPM is uncompressed, so encoding it is much cheaper than PNG
+    """
+    preview = image.copy()
+    preview.thumbnail(size)
+    bio = io.BytesIO()
+    preview.save(bio, format="PPM")
+    return bio.getvalue()
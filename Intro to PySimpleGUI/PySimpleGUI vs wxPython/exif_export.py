@@ -0,0 +1,301 @@
+# exif_export.py
+
+"""
+Catalog the EXIF data of whole photo archives
+
+Photos are found while the tree is being walked and handed to worker
+processes in chunks, and each finished chunk is written out straight
+away, so nothing waits for the whole archive to be listed:
+
+    python exif_export.py export ~/Pictures -o photos.jsonl
+    python exif_export.py export ~/Pictures -o photos.csv --where "Year = 2024"
+    python exif_export.py query photos.jsonl --where "FocalLength > 200" --where "Year = 2024"
+
+A condition is a field, an operator (= != < <= > >= or ~ for "contains")
+and a value. Parquet output needs pyarrow.
+"""
+
+import argparse
+import csv
+import json
+import operator
+import os
+import re
+import sys
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from exif_index import PHOTO_EXTENSIONS, exif_date
+from exif_reader import read_exif
+
+FIELDS = ["path", "size", "Make", "Model", "DateTimeOriginal", "DateTime", "Year",
+          "ExposureTime", "FNumber", "ISOSpeedRatings", "FocalLength", "MaxApertureValue",
+          "ShutterSpeedValue", "Flash", "ExifImageWidth", "ExifImageHeight", "error"]
+
+OPERATORS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "~": lambda value, text: text.lower() in value.lower(),
+}
+CONDITION = re.compile(r"^\s*(\w+)\s*(==|!=|<=|>=|=|<|>|~)\s*(.+?)\s*$")
+
+
+def walk(folder):
+    """
+    Yield the photo paths under folder as they are found
+    """
+    pending = [folder]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith(PHOTO_EXTENSIONS):
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def chunked(paths, size):
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def to_record(path):
+    record = {"path": path}
+    try:
+        record["size"] = os.path.getsize(path)
+        exif = read_exif(path)
+    except OSError as error:
+        record["error"] = str(error)
+        return record
+    for name, value in exif.items():
+        if isinstance(value, tuple):
+            value = value[0] if value else None
+        elif isinstance(value, bytes):
+            value = value.hex()
+        elif isinstance(value, float) and value != value:
+            value = None
+        record[name] = value
+    taken = exif_date(exif.get("DateTimeOriginal") or exif.get("DateTime"))
+    if taken and taken[:4].isdigit():
+        record["Year"] = int(taken[:4])
+    return record
+
+
+def read_chunk(paths):
+    # Runs in a worker process
+    return [to_record(path) for path in paths]
+
+
+def parse_condition(text):
+    match = CONDITION.match(text)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"not a condition: {text!r}")
+    field, symbol, value = match.groups()
+    if symbol == "~":
+        # "Model ~ 6300" is text to look for, not a number
+        return field, OPERATORS[symbol], value.strip("\"'")
+    try:
+        value = float(value)
+    except ValueError:
+        value = value.strip("\"'")
+    return field, OPERATORS[symbol], value
+
+
+def matches(record, conditions):
+    for field, compare, value in conditions:
+        found = record.get(field)
+        if found is None or found == "":
+            return False
+        if isinstance(value, float):
+            try:
+                found = float(found)
+            except (TypeError, ValueError):
+                return False
+        else:
+            found = str(found)
+        if not compare(found, value):
+            return False
+    return True
+
+
+class JSONLinesWriter:
+
+    def __init__(self, path):
+        self.output_file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+    def write(self, records):
+        for record in records:
+            self.output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.output_file.flush()
+
+    def close(self):
+        if self.output_file is not sys.stdout:
+            self.output_file.close()
+
+
+class CSVWriter(JSONLinesWriter):
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.writer = csv.DictWriter(self.output_file, fieldnames=FIELDS, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, records):
+        self.writer.writerows(records)
+        self.output_file.flush()
+
+
+class ParquetWriter:
+    """
+    Writes every batch of records as a row group of a Parquet file
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow: pip install pyarrow")
+        self.pyarrow = pyarrow
+        text, integer, number = pyarrow.string(), pyarrow.int64(), pyarrow.float64()
+        types = {"path": text, "size": integer, "Make": text, "Model": text,
+                 "DateTimeOriginal": text, "DateTime": text, "Year": integer,
+                 "ISOSpeedRatings": integer, "Flash": integer, "ExifImageWidth": integer,
+                 "ExifImageHeight": integer, "error": text}
+        self.schema = pyarrow.schema([(field, types.get(field, number)) for field in FIELDS])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        columns = {field: [record.get(field) for record in records] for field in FIELDS}
+        self.writer.write_table(self.pyarrow.table(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {".jsonl": JSONLinesWriter, ".csv": CSVWriter, ".parquet": ParquetWriter}
+
+
+def writer_for(path, output_format=None):
+    if output_format is None:
+        output_format = os.path.splitext(path)[1].lower().lstrip(".") or "jsonl"
+    if f".{output_format}" not in WRITERS:
+        supported = ", ".join(extension.lstrip(".") for extension in WRITERS)
+        raise ValueError(f"cannot write .{output_format} files, use one of: {supported}")
+    return WRITERS[f".{output_format}"](path)
+
+
+def export(args, writer):
+    workers = args.workers or os.cpu_count() or 1
+    seen = written = errors = 0
+    start = last_report = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        chunks = chunked(walk(args.folder), args.chunk_size)
+        while True:
+            # A few chunks per worker in flight keeps them busy without
+            # holding the whole archive in memory
+            while len(pending) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(executor.submit(read_chunk, chunk))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                records = future.result()
+                seen += len(records)
+                errors += sum("error" in record for record in records)
+                records = [record for record in records if matches(record, args.where)]
+                written += len(records)
+                if records:
+                    writer.write(records)
+            now = time.perf_counter()
+            if now - last_report > 0.5:
+                last_report = now
+                print(f"\r{seen} files, {seen / (now - start):.0f} files/s",
+                      end="", file=sys.stderr)
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\r{seen} files in {elapsed:.1f}s ({seen / max(elapsed, 1e-9):.0f} files/s), "
+          f"{written} written, {errors} errors", file=sys.stderr)
+
+
+def read_records(path):
+    """
+    Yield the records of an export file one at a time
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    elif extension == ".csv":
+        with open(path, newline="", encoding="utf-8") as input_file:
+            yield from csv.DictReader(input_file)
+    else:
+        with open(path, encoding="utf-8") as input_file:
+            for line in input_file:
+                yield json.loads(line)
+
+
+def query(args):
+    start = time.perf_counter()
+    seen = found = 0
+    for record in read_records(args.input):
+        seen += 1
+        if matches(record, args.where):
+            found += 1
+            print(record["path"] if args.paths_only else json.dumps(record, ensure_ascii=False))
+    elapsed = time.perf_counter() - start
+    print(f"{found} of {seen} photos match ({seen / max(elapsed, 1e-9):.0f} records/s)",
+          file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and query the EXIF data of photo trees")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="read every photo under a folder")
+    export_parser.add_argument("folder")
+    export_parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    export_parser.add_argument("--format", choices=["jsonl", "csv", "parquet"],
+                               help="default from the output file extension")
+    export_parser.add_argument("--workers", type=int, help="processes, default one per CPU")
+    export_parser.add_argument("--chunk-size", type=int, default=64,
+                               help="photos per task sent to a worker")
+
+    query_parser = commands.add_parser("query", help="filter an exported file")
+    query_parser.add_argument("input")
+    query_parser.add_argument("--paths-only", action="store_true", help="only print paths")
+
+    for command in (export_parser, query_parser):
+        command.add_argument("--where", type=parse_condition, action="append", default=[],
+                             help='a condition like "FocalLength > 200", can be repeated')
+
+    args = parser.parse_args()
+    if args.command == "export":
+        try:
+            writer = writer_for(args.output, args.format)
+        except ValueError as error:
+            export_parser.error(str(error))
+        export(args, writer)
+    else:
+        query(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# exif_index.py
+
+"""
+A SQLite index of photo metadata, so a library is only read once
+
+Each photo is stored with its modification time and size. Looking a
+photo up again only reads the file if either of those changed, or if
+it asks for tags that weren't decoded the last time.
+
+    python exif_index.py index ~/Pictures
+    python exif_index.py search --model "Canon EOS 7D" --min-iso 400
+    python exif_index.py search --after 2021-01-01 --before 2021-12-31
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from pathlib import Path
+
+from exif_reader import ALL_TAGS, read_exif
+
+INDEX_PATH = Path(os.environ.get("EXIF_INDEX",
+                                 Path.home() / ".cache" / "exif_viewer" / "metadata.sqlite"))
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".tif", ".tiff")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    make TEXT,
+    model TEXT,
+    taken TEXT,
+    iso INTEGER,
+    focal_length REAL,
+    f_number REAL,
+    exposure REAL,
+    exif TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS photos_model ON photos (model);
+CREATE INDEX IF NOT EXISTS photos_iso ON photos (iso);
+CREATE INDEX IF NOT EXISTS photos_taken ON photos (taken);
+"""
+
+
+def exif_date(value):
+    """
+    Turn "2021:04:27 09:04:05" into "2021-04-27 09:04:05" so dates sort
+    """
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    return value[:10].replace(":", "-") + value[10:]
+
+
+def json_value(value):
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def first(value):
+    # A few cameras write ISO as a list of values
+    return value[0] if isinstance(value, tuple) and value else value
+
+
+def open_index(path=INDEX_PATH):
+    """
+    Open the index, or return None if it is locked, corrupt or can't be made
+    """
+    try:
+        return ExifIndex(path)
+    except (sqlite3.Error, OSError):
+        return None
+
+
+class ExifIndex:
+
+    def __init__(self, path=INDEX_PATH):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(path))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self.reads = 0
+
+    def close(self):
+        self.connection.close()
+
+    def get(self, path, fields=None, commit=True):
+        """
+        Return the EXIF dict of a photo, reading the file only if it changed
+
+        Only the tags in fields are decoded, all of them by default. The
+        stored JSON keeps tags that were decoded but missing as null, so
+        a later call knows whether it can be answered from the index.
+        """
+        tags = ALL_TAGS if fields is None else ALL_TAGS.intersection(fields)
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, exif FROM photos WHERE path = ?", (path,)
+        ).fetchone()
+        stored = {}
+        if row is not None and row["mtime_ns"] == stat.st_mtime_ns and row["size"] == stat.st_size:
+            stored = json.loads(row["exif"])
+            if tags <= stored.keys():
+                return {name: stored[name] for name in tags if stored[name] is not None}
+            # Decode what was asked for now together with what was already known
+            tags = tags | stored.keys()
+
+        found = read_exif(path, tags)
+        exif = {name: json_value(found.get(name)) for name in tags}
+        self.reads += 1
+        self.connection.execute(
+            "INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_mtime_ns, stat.st_size, exif.get("Make"), exif.get("Model"),
+             exif_date(exif.get("DateTimeOriginal") or exif.get("DateTime")),
+             first(exif.get("ISOSpeedRatings")), exif.get("FocalLength"),
+             exif.get("FNumber"), exif.get("ExposureTime"), json.dumps(exif)),
+        )
+        if commit:
+            self.connection.commit()
+        return {name: value for name, value in exif.items() if value is not None}
+
+    def index_folder(self, folder, progress=None):
+        """
+        Add every photo under folder to the index, returning how many were seen
+        """
+        count = 0
+        pending = [os.path.abspath(folder)]
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name.lower().endswith(PHOTO_EXTENSIONS):
+                    try:
+                        self.get(entry.path, commit=False)
+                    except OSError:
+                        continue
+                    count += 1
+                    if progress is not None and count % 500 == 0:
+                        progress(count)
+            self.connection.commit()
+        return count
+
+    def search(self, model=None, min_iso=None, max_iso=None, after=None, before=None,
+               limit=100):
+        """
+        Return the rows that match every condition that was given
+        """
+        conditions = []
+        params = []
+        if model:
+            conditions.append("model LIKE ?")
+            params.append(f"%{model}%")
+        if min_iso is not None:
+            conditions.append("iso >= ?")
+            params.append(min_iso)
+        if max_iso is not None:
+            conditions.append("iso <= ?")
+            params.append(max_iso)
+        if after:
+            conditions.append("taken >= ?")
+            params.append(after)
+        if before:
+            # Dates without a time still include the whole day
+            conditions.append("taken < ?")
+            params.append(before + "~" if len(before) == 10 else before)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return self.connection.execute(
+            f"SELECT * FROM photos{where} ORDER BY taken LIMIT ?", params + [limit]
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and search photo metadata")
+    parser.add_argument("--index", default=INDEX_PATH, help="SQLite file to use")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_parser = commands.add_parser("index", help="add the photos in a folder")
+    index_parser.add_argument("folder")
+    search_parser = commands.add_parser("search", help="find indexed photos")
+    search_parser.add_argument("--model", help="part of the camera model")
+    search_parser.add_argument("--min-iso", type=int)
+    search_parser.add_argument("--max-iso", type=int)
+    search_parser.add_argument("--after", help="taken on or after, YYYY-MM-DD")
+    search_parser.add_argument("--before", help="taken on or before, YYYY-MM-DD")
+    search_parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    index = ExifIndex(args.index)
+    if args.command == "index":
+        start = time.perf_counter()
+        count = index.index_folder(
+            args.folder, lambda count: print(f"\r{count} photos", end="", file=sys.stderr)
+        )
+        elapsed = time.perf_counter() - start
+        print(f"\r{count} photos in {elapsed:.1f}s, {index.reads} read from disk",
+              file=sys.stderr)
+    else:
+        for row in index.search(args.model, args.min_iso, args.max_iso, args.after,
+                                args.before, args.limit):
+            print(f"{row['taken'] or '':19}  {row['model'] or '':20}  "
+                  f"ISO {row['iso'] or '':<6}  {row['path']}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
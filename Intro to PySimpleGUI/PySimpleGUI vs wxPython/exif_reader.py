@@ -0,0 +1,166 @@
+# exif_reader.py
+
+"""
+Read a handful of EXIF tags straight from the JPEG headers
+
+Pillow's _getexif() opens the image, parses every tag and returns a
+private API result. This reader memory maps the file, walks the JPEG
+markers up to the APP1 segment, and decodes only the tags it is asked
+for, so the compressed image data is never touched.
+"""
+
+import mmap
+import struct
+
+# Tags in the first IFD of the TIFF header
+IFD0_TAGS = {
+    0x010F: "Make",
+    0x0110: "Model",
+    0x0132: "DateTime",
+}
+
+# Tags in the Exif sub-IFD
+EXIF_TAGS = {
+    0x829A: "ExposureTime",
+    0x829D: "FNumber",
+    0x8827: "ISOSpeedRatings",
+    0x9003: "DateTimeOriginal",
+    0x9201: "ShutterSpeedValue",
+    0x9205: "MaxApertureValue",
+    0x9209: "Flash",
+    0x920A: "FocalLength",
+    0xA002: "ExifImageWidth",
+    0xA003: "ExifImageHeight",
+}
+
+EXIF_IFD_POINTER = 0x8769
+
+# TIFF type -> (struct format, size in bytes)
+TYPES = {
+    1: ("B", 1),    # BYTE
+    2: ("s", 1),    # ASCII
+    3: ("H", 2),    # SHORT
+    4: ("L", 4),    # LONG
+    5: ("LL", 8),   # RATIONAL
+    7: ("B", 1),    # UNDEFINED
+    9: ("l", 4),    # SLONG
+    10: ("ll", 8),  # SRATIONAL
+}
+
+
+def decode_value(data, tiff, order, field_type, count, value_offset):
+    """
+    Decode one IFD entry, following its offset when it doesn't fit in 4 bytes
+    """
+    code, size = TYPES[field_type]
+    length = size * count
+    if length <= 4:
+        start = value_offset
+    else:
+        start = tiff + struct.unpack_from(order + "L", data, value_offset)[0]
+    raw = data[start:start + length]
+    if len(raw) < length:
+        raise ValueError("value past the end of the EXIF data")
+
+    if field_type == 2:
+        return raw.split(b"\0", 1)[0].decode("utf-8", "replace").strip()
+    if field_type == 7:
+        return raw
+    values = struct.unpack(order + code * count, raw)
+    if field_type in (5, 10):
+        values = tuple(
+            numerator / denominator if denominator else float("nan")
+            for numerator, denominator in zip(values[::2], values[1::2])
+        )
+    return values[0] if count == 1 else values
+
+
+def read_ifd(data, tiff, order, offset, wanted, result):
+    """
+    Decode the wanted tags of the IFD at offset and return its other entries
+    """
+    (count,) = struct.unpack_from(order + "H", data, tiff + offset)
+    entries = {}
+    for index in range(count):
+        entry = tiff + offset + 2 + index * 12
+        tag, field_type, value_count = struct.unpack_from(order + "HHL", data, entry)
+        if tag in wanted and field_type in TYPES:
+            result[wanted[tag]] = decode_value(data, tiff, order, field_type,
+                                               value_count, entry + 8)
+        else:
+            entries[tag] = entry + 8
+    return entries
+
+
+def parse_tiff(data, tiff, tags):
+    """
+    Decode the wanted tags of the TIFF structure starting at offset tiff
+    """
+    order = {b"II": "<", b"MM": ">"}.get(bytes(data[tiff:tiff + 2]))
+    if order is None:
+        return {}
+    magic, ifd0 = struct.unpack_from(order + "HL", data, tiff + 2)
+    if magic != 42:
+        return {}
+
+    result = {}
+    ifd0_tags = {tag: name for tag, name in IFD0_TAGS.items() if name in tags}
+    exif_tags = {tag: name for tag, name in EXIF_TAGS.items() if name in tags}
+    entries = read_ifd(data, tiff, order, ifd0, ifd0_tags, result)
+    if exif_tags and EXIF_IFD_POINTER in entries:
+        (exif_ifd,) = struct.unpack_from(order + "L", data, entries[EXIF_IFD_POINTER])
+        read_ifd(data, tiff, order, exif_ifd, exif_tags, result)
+    return result
+
+
+def find_exif(data):
+    """
+    Return the offset of the TIFF header in a JPEG's APP1 segment, or None
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte
+            position += 1
+            continue
+        if marker == 0xDA or marker == 0xD9:
+            # Start of scan: the image data follows, there is no EXIF
+            return None
+        (length,) = struct.unpack_from(">H", data, position + 2)
+        if marker == 0xE1 and data[position + 4:position + 10] == b"Exif\0\0":
+            return position + 10
+        position += 2 + length
+    return None
+
+
+ALL_TAGS = frozenset(IFD0_TAGS.values()) | frozenset(EXIF_TAGS.values())
+
+
+def read_exif(path, tags=ALL_TAGS):
+    """
+    Return {tag name: value} for the tags found in a JPEG or TIFF file
+
+    Files without EXIF, or with EXIF too damaged to read, give an empty
+    dict. Errors opening the file are raised as OSError.
+    """
+    with open(path, "rb") as image_file:
+        try:
+            data = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return {}
+    with data:
+        try:
+            if data[:4] in (b"II*\0", b"MM\0*"):
+                return parse_tiff(data, 0, tags)
+            tiff = find_exif(data)
+            if tiff is None:
+                return {}
+            return parse_tiff(data, tiff, tags)
+        except (struct.error, ValueError, IndexError):
+            return {}
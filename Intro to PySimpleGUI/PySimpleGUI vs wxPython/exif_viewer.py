@@ -1,10 +1,13 @@
 # exif_viewer.py
 
+import sqlite3
+
 import PySimpleGUI as sg
 
 from pathlib import Path
-from PIL import Image
-from PIL.ExifTags import TAGS
+
+from exif_index import open_index
+from exif_reader import read_exif
 
 file_types = [("(JPEG (*.jpg)", "*.jpg"),
               ("All files (*.*)", "*.*")]
@@ -27,25 +30,23 @@ fields = {
 }
 
 
-def get_exif_data(path):
+def get_exif_data(path, index=None):
     """
     Extracts the EXIF information from the provided photo
+
+    Only the tags in fields are decoded. With an index, a photo that
+    hasn't changed since it was last seen isn't read again; if the index
+    can't be used the photo is read directly
     """
-    exif_data = {}
     try:
-        image = Image.open(path)
-        info = image._getexif()
+        if index is not None:
+            try:
+                return index.get(path, fields.keys())
+            except sqlite3.Error:
+                pass
+        return read_exif(path, tags=fields.keys())
     except OSError:
-        info = {}
-
-    if info is None:
-        info = {}
-
-    for tag, value in info.items():
-        decoded = TAGS.get(tag, tag)
-        exif_data[decoded] = value
-
-    return exif_data
+        return {}
 
 
 def main():
@@ -63,6 +64,7 @@ def main():
              sg.Text("", size=(25, 1), key=field)]
         ]
     window = sg.Window("Image information", layout)
+    index = open_index()
 
     while True:
         event, values = window.read()
@@ -70,7 +72,7 @@ def main():
             break
         if event == "-LOAD-":
             image_path = Path(values["-LOAD-"])
-            exif_data = get_exif_data(image_path.absolute())
+            exif_data = get_exif_data(image_path.absolute(), index)
             for field in fields:
                 if field == "File name":
                     window[field].update(image_path.name)
@@ -79,6 +81,9 @@ def main():
                 else:
                     window[field].update(exif_data.get(field, "No data"))
 
+    if index is not None:
+        index.close()
+
 
 if __name__ == "__main__":
     main()
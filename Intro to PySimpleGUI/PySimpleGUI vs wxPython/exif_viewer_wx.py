@@ -1,31 +1,39 @@
 # exif_viewer.py
 
 import os
+import sqlite3
 import wx
 
-from PIL import Image
-from PIL.ExifTags import TAGS
+from exif_index import open_index
+from exif_reader import read_exif
 
 wildcard = "JPEG (*.jpg)|*.jpg|" "All files (*.*)|*.*"
 
 
-def get_exif_data(path):
+def get_exif_data(path, index=None, tags=None):
     """
     Extracts the EXIF information from the provided photo
-    """
-    exif_data = {}
-    image = Image.open(path)
-    info = image._getexif()
-    for tag, value in info.items():
-        decoded = TAGS.get(tag, tag)
-        exif_data[decoded] = value
 
-    return exif_data
+    Photos without EXIF give an empty dict. With an index, a photo that
+    hasn't changed since it was last seen isn't read again; if the index
+    can't be used the photo is read directly
+    """
+    try:
+        if index is not None:
+            try:
+                return index.get(path, tags)
+            except sqlite3.Error:
+                pass
+        if tags is not None:
+            return read_exif(path, tags=tags)
+        return read_exif(path)
+    except OSError:
+        return {}
 
 
 class Photo:
-    def __init__(self, photo_path):
-        self.exif_data = get_exif_data(photo_path)
+    def __init__(self, photo_path, index=None, tags=None):
+        self.exif_data = get_exif_data(photo_path, index, tags)
         self.filename = os.path.basename(photo_path)
         self.filesize = os.path.getsize(photo_path)
 
@@ -52,6 +60,7 @@ class MainPanel(wx.Panel):
         self.exif_data = {}
         self.filename = ""
         self.filesize = ""
+        self.index = open_index()
 
         self.main_sizer = wx.BoxSizer(wx.VERTICAL)
         load_file_button = wx.Button(self, label="Load Image Metadata")
@@ -107,7 +116,7 @@ class MainPanel(wx.Panel):
         ) as dlg:
             if dlg.ShowModal() == wx.ID_OK:
                 path = dlg.GetPath()
-                photo = Photo(path)
+                photo = Photo(path, self.index, self.photo_data.keys())
                 self.update_panel(photo)
 
     def update_panel(self, photo):
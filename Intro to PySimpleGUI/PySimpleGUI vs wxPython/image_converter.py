@@ -1,31 +1,76 @@
 # image_converter.py
 
-import io
 import os
 import PySimpleGUI as sg
-import shutil
-import tempfile
+import threading
+import time
 
-from create_bw import black_and_white
-from create_grayscale import grayscale
-from create_sepia import create_sepia as sepia
-from PIL import Image
+from batch_converter import progress_text, run_batch
+from effect_chain import ChainCache, file_key, step
+from effects import effects, open_image, preview_data, save_image
 
 file_types = [("JPEG (*.jpg)", "*.jpg"), ("All files (*.*)", "*.*")]
 
-tmp_file = tempfile.NamedTemporaryFile(suffix=".jpg").name
 
-effects = {
-    "Normal": shutil.copy,
-    "Black and White": black_and_white,
-    "Grayscale": grayscale,
-    "Sepia": sepia,
-}
+def batch_layout(effect_names):
+    return [
+        [sg.Text("Input Folder", size=(12, 1)), sg.Input(size=(25, 1), key="-BATCH IN-"),
+         sg.FolderBrowse()],
+        [sg.Text("Output Folder", size=(12, 1)), sg.Input(size=(25, 1), key="-BATCH OUT-"),
+         sg.FolderBrowse()],
+        [sg.Text("Effects")],
+        [sg.Listbox(effect_names, default_values=["Sepia"], key="-BATCH EFFECTS-",
+                    select_mode=sg.LISTBOX_SELECT_MODE_MULTIPLE, size=(30, 4))],
+        [
+            sg.Text("Format"),
+            sg.Combo(["jpg", "png", "webp"], default_value="jpg", key="-BATCH FORMAT-",
+                     readonly=True),
+            sg.Text("Max size"),
+            sg.Input("", size=(6, 1), key="-BATCH SIZE-"),
+            sg.Text("Workers"),
+            sg.Spin(list(range(1, (os.cpu_count() or 1) + 1)),
+                    initial_value=os.cpu_count() or 1, key="-BATCH WORKERS-"),
+        ],
+        [sg.Checkbox("Include subfolders", key="-BATCH RECURSIVE-")],
+        [sg.Button("Start Batch"), sg.Button("Stop Batch", disabled=True)],
+        [sg.ProgressBar(100, size=(30, 15), key="-BATCH PROGRESS-")],
+        [sg.Text("", key="-BATCH STATUS-", size=(50, 2))],
+    ]
+
+
+def batch_worker(window, values, stop_event):
+    """
+    Run a batch in a thread, sending progress back to the event loop
+    """
+    def progress(done, total, failed, elapsed):
+        window.write_event_value("-BATCH UPDATE-", (done, total, failed, elapsed))
+
+    size = values["-BATCH SIZE-"].strip()
+    message = "Batch stopped"
+    try:
+        summary = run_batch(
+            values["-BATCH IN-"], values["-BATCH OUT-"], values["-BATCH EFFECTS-"],
+            values["-BATCH FORMAT-"], int(size) if size.isdigit() else None,
+            workers=int(values["-BATCH WORKERS-"]),
+            recursive=values["-BATCH RECURSIVE-"],
+            progress=progress, should_stop=stop_event.is_set,
+        )
+        message = (
+            f"{summary['done']} files in {summary['seconds']:.1f}s "
+            f"({summary['files_per_second']:.1f} files/s), {summary['failed']} failed, "
+            f"{summary['skipped']} already done"
+        )
+    except Exception as error:
+        # A crashed worker process (BrokenProcessPool) ends up here too
+        message = f"Batch failed: {type(error).__name__}: {error}"
+    finally:
+        # Always sent, or the Start button would stay disabled
+        window.write_event_value("-BATCH DONE-", message)
 
 
 def main():
     effect_names = list(effects.keys())
-    layout = [
+    single_layout = [
         [sg.Image(key="-IMAGE-", size=(400, 400))],
         [
             sg.Text("Image File"),
@@ -40,36 +85,91 @@ def main():
                 enable_events=True, readonly=True
             ),
         ],
-        [sg.Button("Save")],
+        [
+            sg.Text("Contrast"),
+            sg.Slider((0.0, 3.0), 1.0, resolution=0.1, orientation="h", size=(25, 15),
+                      key="-CONTRAST-", enable_events=True),
+        ],
+        [sg.Button("Save"), sg.Text("", key="-TIMING-", size=(40, 1))],
     ]
+    layout = [[sg.TabGroup([[
+        sg.Tab("Single Image", single_layout),
+        sg.Tab("Batch", batch_layout(effect_names)),
+    ]])]]
 
-    window = sg.Window("Image Converter", layout, size=(450, 500))
+    window = sg.Window("Image Converter", layout, size=(450, 600))
+    stop_event = threading.Event()
+
+    # The decoded original and the result of the current effect
+    loaded_file = None
+    original = None
+    result = None
+    # Moving the contrast slider only reruns the contrast step
+    chain_cache = ChainCache()
 
     while True:
         event, values = window.read()
         if event == "Exit" or event == sg.WIN_CLOSED:
             break
-        if event in ["Load Image", "-EFFECTS-"]:
-            selected_effect = values["-EFFECTS-"]
+        if event in ["Load Image", "-EFFECTS-", "-CONTRAST-"]:
+            chain = [step(values["-EFFECTS-"])]
+            if values["-CONTRAST-"] != 1.0:
+                # At 1.0 contrast changes nothing, so skip the full size pass
+                chain.append(step("Contrast", factor=values["-CONTRAST-"]))
             image_file = values["-FILENAME-"]
             if os.path.exists(image_file):
-                effects[selected_effect](image_file, tmp_file)
-                image = Image.open(tmp_file)
-                image.thumbnail((400, 400))
-                bio = io.BytesIO()
-                image.save(bio, format="PNG")
-                window["-IMAGE-"].update(data=bio.getvalue())
-        if event == "Save" and values["-FILENAME-"]:
+                start = time.perf_counter()
+                if image_file != loaded_file or event == "Load Image":
+                    original = open_image(image_file)
+                    loaded_file = image_file
+                decoded = time.perf_counter()
+                steps_run = chain_cache.steps_run
+                result = chain_cache.render(original, chain, file_key(image_file))
+                applied = time.perf_counter()
+                window["-IMAGE-"].update(data=preview_data(result))
+                shown = time.perf_counter()
+                window["-TIMING-"].update(
+                    f"decode {(decoded - start) * 1000:.0f} ms, "
+                    f"effects {(applied - decoded) * 1000:.0f} ms "
+                    f"({chain_cache.steps_run - steps_run} run), "
+                    f"preview {(shown - applied) * 1000:.0f} ms"
+                )
+        if event == "Save" and result is not None:
             save_filename = sg.popup_get_file(
                 "File", file_types=file_types, save_as=True, no_window=True
             )
-            if save_filename == values["-FILENAME-"]:
+            if save_filename == loaded_file:
                 sg.popup_error(
                     "You are not allowed to overwrite the original image!")
             else:
                 if save_filename:
-                    shutil.copy(tmp_file, save_filename)
+                    save_image(result, save_filename)
                     sg.popup(f"Saved: {save_filename}")
+        if event == "Start Batch":
+            if not (os.path.isdir(values["-BATCH IN-"]) and values["-BATCH OUT-"]
+                    and values["-BATCH EFFECTS-"]):
+                sg.popup_error("Choose an input folder, an output folder and an effect")
+                continue
+            stop_event.clear()
+            window["Start Batch"].update(disabled=True)
+            window["Stop Batch"].update(disabled=False)
+            window["-BATCH STATUS-"].update("Starting...")
+            threading.Thread(
+                target=batch_worker, args=(window, values, stop_event), daemon=True
+            ).start()
+        if event == "Stop Batch":
+            stop_event.set()
+            window["-BATCH STATUS-"].update("Stopping after the files in progress...")
+        if event == "-BATCH UPDATE-":
+            done, total, failed, elapsed = values[event]
+            window["-BATCH PROGRESS-"].update(done, max=max(total, 1))
+            window["-BATCH STATUS-"].update(progress_text(done, total, failed, elapsed))
+        if event == "-BATCH DONE-":
+            window["Start Batch"].update(disabled=False)
+            window["Stop Batch"].update(disabled=True)
+            window["-BATCH STATUS-"].update(values[event])
+
+    stop_event.set()
 
     window.close()
 
@@ -1,12 +1,31 @@
 # image_converter.py
 
-import os
-import shutil
+import threading
+import time
 import wx
 
-from create_bw import black_and_white
-from create_grayscale import grayscale
-from create_sepia import create_sepia as sepia
+from effects import effects, open_image, render_in_strips, save_image
+from image_loader import ImageLoader
+
+
+def render_preview(path, loaded_path, original, proxy, effect_name, max_size):
+    """
+    Decode the image if it isn't loaded yet and apply the effect to the
+    preview sized copy. Runs in the loader thread
+    """
+    start = time.perf_counter()
+    if path != loaded_path:
+        original = open_image(path)
+        proxy = original.copy()
+        proxy.thumbnail((max_size, max_size))
+    decoded = time.perf_counter()
+    current = effects[effect_name](proxy)
+    preview = current.convert("RGB")
+    applied = time.perf_counter()
+    timing = f"effect {(applied - decoded) * 1000:.0f} ms"
+    if path != loaded_path:
+        timing = f"decode {(decoded - start) * 1000:.0f} ms, {timing}"
+    return path, original, proxy, effect_name, current, preview, timing
 
 
 class ImageConverterPanel(wx.Panel):
@@ -14,9 +33,15 @@ class ImageConverterPanel(wx.Panel):
         super().__init__(parent)
         self.max_size = 460
         self.original_image = ""
-        self.current_image = ""
-        self.image = None
-        self.std_paths = wx.StandardPaths.Get()
+        # The decoded original, a copy scaled down to the preview size,
+        # the effect on screen and that effect applied to the copy. They
+        # are replaced together when a preview arrives, so Save always
+        # writes the image and effect that are shown.
+        self.original = None
+        self.proxy = None
+        self.effect_name = None
+        self.current = None
+        self.loader = ImageLoader(post=wx.CallAfter)
         self.main_sizer = wx.BoxSizer(wx.VERTICAL)
         self.create_widgets()
 
@@ -40,9 +65,15 @@ class ImageConverterPanel(wx.Panel):
         self.effects_combo.Bind(wx.EVT_COMBOBOX, self.on_effect)
         self.add_row_of_widgets([effects_label, self.effects_combo])
 
-        save_btn = wx.Button(self, label="Save")
-        save_btn.Bind(wx.EVT_BUTTON, self.on_save)
-        self.main_sizer.Add(save_btn, 0, wx.ALL | wx.CENTER, 5)
+        self.save_btn = wx.Button(self, label="Save")
+        self.save_btn.Bind(wx.EVT_BUTTON, self.on_save)
+        self.main_sizer.Add(self.save_btn, 0, wx.ALL | wx.CENTER, 5)
+
+        self.progress = wx.Gauge(self, range=100, size=(200, -1))
+        self.main_sizer.Add(self.progress, 0, wx.ALL | wx.CENTER, 5)
+
+        self.timing_txt = wx.StaticText(self, label="")
+        self.main_sizer.Add(self.timing_txt, 0, wx.ALL | wx.CENTER, 5)
 
     def add_row_of_widgets(self, widgets):
         hsizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -60,44 +91,50 @@ class ImageConverterPanel(wx.Panel):
             None, "Choose a file", wildcard=wildcard, style=wx.FD_OPEN
         ) as dialog:
             if dialog.ShowModal() == wx.ID_OK:
-                self.original_image = dialog.GetPath()
-                self.current_image = self.original_image
-                self.photo_txt.SetValue(self.original_image)
-                self.load_image()
+                self.photo_txt.SetValue(dialog.GetPath())
+                self.render(dialog.GetPath())
 
     def on_effect(self, event):
         """
         Apply the specified effect to the image
         """
-        if not self.current_image:
-            return
+        if self.photo_txt.GetValue():
+            self.render(self.photo_txt.GetValue())
 
-        tmp = os.path.join(self.std_paths.GetTempDir(), "temp.jpg")
-        effects = {
-            "Black and White": black_and_white,
-            "Grayscale": grayscale,
-            "Sepia": sepia,
-        }
-        effect = self.effects_combo.GetValue()
-        if effect in effects:
-            effects[effect](self.original_image, tmp)
-            self.current_image = tmp
-            self.load_image()
-        else:
-            self.current_image = self.original_image
-            self.load_image()
+    def render(self, path):
+        """
+        Ask the loader for a new preview, replacing any older request
+        """
+        self.timing_txt.SetLabel("Loading...")
+        self.loader.submit(
+            render_preview, self.show_preview, path, self.original_image,
+            self.original, self.proxy, self.effects_combo.GetValue(), self.max_size,
+        )
+
+    def show_preview(self, result, error):
+        if error is not None:
+            self.timing_txt.SetLabel(f"Could not open image: {error}")
+            self.Layout()
+            return
+        (self.original_image, self.original, self.proxy, self.effect_name, self.current,
+         preview, timing) = result
+        start = time.perf_counter()
+        self.load_image(preview)
+        shown = time.perf_counter()
+        self.timing_txt.SetLabel(f"{timing}, preview {(shown - start) * 1000:.0f} ms")
+        self.Layout()
 
     def on_save(self, event):
         """
         Save the image
         """
-        if not self.current_image:
+        if self.current is None:
             # current image is empty
             return
         if not self.original_image:
             # no image loaded
             return
-        if self.effects_combo.GetValue() == "Normal":
+        if self.effect_name == "Normal":
             # nothing to save
             return
 
@@ -110,26 +147,51 @@ class ImageConverterPanel(wx.Panel):
                 if save_path == self.original_image:
                     self.show_error_message()
                 else:
-                    # Copy the temporary image to the
-                    # save location
-                    shutil.copy(self.current_image, save_path)
+                    self.start_save(save_path)
 
-    def load_image(self):
+    def start_save(self, save_path):
         """
-        Load the image and display it to the user
+        Render the full resolution image in a thread, then save it
         """
-        img = wx.Image(self.current_image, wx.BITMAP_TYPE_ANY)
-
-        # scale the image, preserving the aspect ratio
-        W = img.GetWidth()
-        H = img.GetHeight()
-        if W > H:
-            new_w = self.max_size
-            new_h = int(self.max_size * H / W)
+        effect = effects[self.effect_name]
+        self.save_btn.Disable()
+        self.progress.SetValue(0)
+        thread = threading.Thread(
+            target=self.render_and_save,
+            args=(self.original, effect, save_path),
+            daemon=True,
+        )
+        thread.start()
+
+    def render_and_save(self, original, effect, save_path):
+        # Runs in the worker thread, so the UI is only touched via wx.CallAfter
+        def progress(done, total):
+            wx.CallAfter(self.progress.SetValue, int(90 * done / total))
+
+        try:
+            result = render_in_strips(original, effect, progress=progress)
+            save_image(result, save_path)
+        except (OSError, ValueError) as error:
+            wx.CallAfter(self.on_save_done, save_path, error)
+        else:
+            wx.CallAfter(self.on_save_done, save_path, None)
+
+    def on_save_done(self, save_path, error):
+        self.save_btn.Enable()
+        if error is None:
+            self.progress.SetValue(100)
+            self.timing_txt.SetLabel(f"Saved {save_path}")
         else:
-            new_h = self.max_size
-            new_w = int(self.max_size * W / H)
-        img = img.Scale(new_w, new_h)
+            self.progress.SetValue(0)
+            self.timing_txt.SetLabel(f"Could not save {save_path}: {error}")
+        self.Layout()
+
+    def load_image(self, preview):
+        """
+        Display the preview to the user
+        """
+        # The proxy is already scaled, preserving the aspect ratio
+        img = wx.Image(preview.width, preview.height, preview.tobytes())
 
         self.image_ctrl.SetBitmap(wx.Bitmap(img))
         self.Refresh()
@@ -2,11 +2,14 @@
 
 import wx
 
+from image_loader import ImageLoader, scaled_image
+
 
 class ImagePanel(wx.Panel):
     def __init__(self, parent, image_size):
         super().__init__(parent)
         self.max_size = 240
+        self.loader = ImageLoader(post=wx.CallAfter)
 
         img = wx.Image(*image_size)
         self.image_ctrl = wx.StaticBitmap(
@@ -45,22 +48,17 @@ class ImagePanel(wx.Panel):
 
     def load_image(self):
         """
-        Load the image and display it to the user
+        Load the image in the background and display it to the user
         """
         filepath = self.photo_txt.GetValue()
-        img = wx.Image(filepath, wx.BITMAP_TYPE_ANY)
-
-        # scale the image, preserving the aspect ratio
-        W = img.GetWidth()
-        H = img.GetHeight()
-        if W > H:
-            new_w = self.max_size
-            new_h = self.max_size * H / W
-        else:
-            new_h = self.max_size
-            new_w = self.max_size * W / H
-        img = img.Scale(int(new_w), int(new_h))
-
+        # scaled in the loader thread, preserving the aspect ratio
+        self.loader.submit(scaled_image, self.show_image, filepath, self.max_size)
+
+    def show_image(self, image, error):
+        if error is not None:
+            wx.MessageBox(str(error), "Could not open image", wx.ICON_ERROR)
+            return
+        img = wx.Image(image.width, image.height, image.tobytes())
         self.image_ctrl.SetBitmap(wx.Bitmap(img))
         self.Refresh()
 
@@ -0,0 +1,154 @@
+# test_image_loader.py
+
+import os
+import queue
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+import image_loader
+from image_loader import ImageLoader, scaled_image
+
+try:
+    import wx
+except ImportError:
+    wx = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COPY = os.path.join(HERE, "..", "..", "Python GUI Frameworks", "image_loader.py")
+
+
+class FakeCallAfter:
+    """
+    Stands in for wx.CallAfter: calls are queued and only run when the
+    test, playing the GUI thread, pumps them
+    """
+
+    def __init__(self):
+        self.calls = queue.Queue()
+
+    def __call__(self, function, *args):
+        self.calls.put((function, args))
+
+    def pump(self, timeout=5):
+        function, args = self.calls.get(timeout=timeout)
+        function(*args)
+
+
+class TestImageLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.post = FakeCallAfter()
+        self.loader = ImageLoader(self.post)
+        self.results = []
+
+    def done(self, result, error):
+        self.results.append((result, error, threading.current_thread()))
+
+    def test_result_is_delivered_through_post(self):
+        """
+        done() runs only when the posted call runs, on the pumping thread
+        """
+        self.loader.submit(lambda x: x * 2, self.done, 21)
+        self.post.pump()
+        self.assertEqual(self.results, [(42, None, threading.main_thread())])
+
+    def test_error_is_delivered(self):
+        """
+        An exception in the work is passed to done() instead of raised
+        """
+        self.loader.submit(lambda: 1 / 0, self.done)
+        self.post.pump()
+        result, error, _ = self.results[0]
+        self.assertIsNone(result)
+        self.assertIsInstance(error, ZeroDivisionError)
+
+    def test_stale_result_is_dropped(self):
+        """
+        A result that arrives after a newer request was made isn't shown
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "old"
+
+        self.loader.submit(slow, self.done)
+        started.wait(5)
+        self.loader.submit(lambda: "new", self.done)
+        release.set()
+        self.post.pump()
+        self.post.pump()
+        self.assertEqual([result for result, _, _ in self.results], ["new"])
+
+    def test_cancel_drops_the_running_request(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "cancelled"
+
+        self.loader.submit(slow, self.done)
+        started.wait(5)
+        self.loader.cancel()
+        release.set()
+        self.post.pump()
+        self.assertEqual(self.results, [])
+
+
+@unittest.skipIf(wx is None, "wxPython is not installed")
+class TestWithCallAfter(unittest.TestCase):
+
+    def test_done_runs_on_the_gui_thread(self):
+        app = wx.App(False)
+        frame = wx.Frame(None)
+        results = []
+
+        def done(result, error):
+            results.append((result, error, threading.current_thread()))
+            frame.Destroy()
+
+        loader = ImageLoader(post=wx.CallAfter)
+        loader.submit(sum, done, [1, 2, 3])
+        # Fails the test instead of hanging if nothing is delivered
+        wx.CallLater(5000, frame.Destroy)
+        app.MainLoop()
+        self.assertEqual(results, [(6, None, threading.main_thread())])
+
+
+class TestScaledImage(unittest.TestCase):
+
+    def scaled_size(self, size, max_size=240):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "photo.jpg")
+            Image.new("RGB", size).save(path)
+            return scaled_image(path, max_size).size
+
+    def test_large_image_is_scaled_down(self):
+        self.assertEqual(self.scaled_size((3000, 2000)), (240, 160))
+
+    def test_small_image_is_scaled_up(self):
+        """
+        The longest side always fills max_size, like the viewers did
+        before the loader
+        """
+        self.assertEqual(self.scaled_size((100, 50)), (240, 120))
+        self.assertEqual(self.scaled_size((50, 100)), (120, 240))
+
+
+class TestCopies(unittest.TestCase):
+
+    def test_copy_in_python_gui_frameworks_is_identical(self):
+        with open(image_loader.__file__, encoding="utf-8") as original, \
+                open(COPY, encoding="utf-8") as copy:
+            self.assertEqual(original.read(), copy.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
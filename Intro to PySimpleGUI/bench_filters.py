@@ -0,0 +1,125 @@
+# bench_filters.py
+
+"""
+Time each OpenCV demo filter before and after keeping its state
+
+"before" is apply_filter(), which makes new images (and a new CLAHE
+object) for every frame. "after" is FrameFilters, which reuses its
+buffers. Both run over the same recorded clip; without a video file a
+clip of the synthetic test pattern is recorded first.
+
+    python bench_filters.py
+    python bench_filters.py my_clip.mp4 --frames 300
+
+Allocations are measured with tracemalloc in a separate pass, as the
+memory newly allocated while filtering one frame.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+
+from frame_filters import FILTERS, FrameFilters, apply_filter
+from frame_pipeline import SyntheticSource
+
+VALUES = {
+    "-THRESH SLIDER-": 128.0,
+    "-CANNY SLIDER A-": 100.0,
+    "-CANNY SLIDER B-": 200.0,
+    "-BLUR SLIDER-": 3.0,
+    "-HUE SLIDER-": 90.0,
+    "-ENHANCE SLIDER-": 128.0,
+}
+
+
+def record_clip(path, frames, width=640, height=480):
+    source = SyntheticSource(width, height, fps=0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (width, height))
+    for _ in range(frames):
+        writer.write(source.read()[1])
+    writer.release()
+
+
+def read_clip(path, frames):
+    capture = cv2.VideoCapture(path)
+    clip = []
+    while len(clip) < frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        clip.append(frame)
+    capture.release()
+    if not clip:
+        raise SystemExit(f"no frames in {path}")
+    return clip
+
+
+def values_for(key):
+    values = dict(VALUES)
+    values.update({name: name == key for name in FILTERS})
+    return values
+
+
+def warm_up(process, clip, values):
+    # Fills every output buffer FrameFilters rotates through
+    for frame in clip[:8]:
+        process(frame, values)
+
+
+def time_per_frame(process, clip, values):
+    warm_up(process, clip, values)
+    start = time.perf_counter()
+    for frame in clip:
+        process(frame, values)
+    return (time.perf_counter() - start) / len(clip)
+
+
+def allocated_per_frame(process, clip, values):
+    warm_up(process, clip, values)
+    tracemalloc.start()
+    total = 0
+    for frame in clip:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = process(frame, values)
+        total += tracemalloc.get_traced_memory()[1] - before
+        del result
+    tracemalloc.stop()
+    return total / len(clip)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OpenCV demo filters")
+    parser.add_argument("video", nargs="?", help="clip to filter, default a synthetic one")
+    parser.add_argument("--frames", type=int, default=120)
+    args = parser.parse_args()
+
+    if args.video:
+        clip = read_clip(args.video, args.frames)
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "clip.avi")
+            record_clip(path, args.frames)
+            clip = read_clip(path, args.frames)
+    height, width = clip[0].shape[:2]
+    print(f"{len(clip)} frames of {width}x{height}\n")
+
+    print(f"{'filter':10} {'before':>10} {'after':>10} {'speedup':>8}"
+          f"   {'alloc before':>13} {'alloc after':>12}")
+    for key in FILTERS:
+        values = values_for(key)
+        before = time_per_frame(apply_filter, clip, values)
+        after = time_per_frame(FrameFilters(), clip, values)
+        allocated_before = allocated_per_frame(apply_filter, clip, values)
+        allocated_after = allocated_per_frame(FrameFilters(), clip, values)
+        print(f"{key.strip('-').lower():10} {before * 1000:8.2f}ms {after * 1000:8.2f}ms "
+              f"{before / after:7.1f}x   {allocated_before / 1024:10.0f} KB "
+              f"{allocated_after / 1024:9.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
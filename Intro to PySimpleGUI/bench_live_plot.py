@@ -0,0 +1,111 @@
+# bench_live_plot.py
+
+"""
+Measure how many times per second a streaming plot can be redrawn
+
+Three ways of showing the same ring buffer are compared for buffers of
+10 thousand to 10 million samples, adding a batch of new samples before
+every frame:
+
+    full draw   set_data() with every sample and canvas.draw(), as the
+                static example does
+    blit        only the line is redrawn over a saved background, still
+                with every sample
+    downsample  blitting plus the per pixel min/max reduction
+
+It runs on the Agg backend, so no window is needed; on screen TkAgg
+adds the cost of copying the pixels into Tk.
+
+    python bench_live_plot.py
+    python bench_live_plot.py --sizes 10000 1000000 --seconds 2
+"""
+
+import argparse
+import time
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from live_plot import LivePlot, RingBuffer, Telemetry
+
+
+def make_axes():
+    figure = Figure(figsize=(8, 4), dpi=100)
+    FigureCanvasAgg(figure)
+    return figure.add_subplot(111)
+
+
+def full_draw(size, telemetry, batch):
+    axes = make_axes()
+    buffer = RingBuffer(size)
+    buffer.extend(*telemetry.samples(size))
+    (line,) = axes.plot([], [], linewidth=1)
+    axes.set_ylim(-2, 2)
+
+    def frame():
+        buffer.extend(*telemetry.samples(batch))
+        segments = buffer.segments()
+        x = np.concatenate([x for x, _ in segments])
+        y = np.concatenate([y for _, y in segments])
+        line.set_data(x - x[-1], y)
+        axes.set_xlim(x[0] - x[-1], 0)
+        axes.figure.canvas.draw()
+    return frame
+
+
+def live(size, telemetry, batch, downsample):
+    plot = LivePlot(make_axes(), size, span=size / telemetry.rate, ylim=(-2, 2),
+                    downsample=downsample)
+    plot.add(*telemetry.samples(size))
+
+    def frame():
+        plot.add(*telemetry.samples(batch))
+        plot.update()
+    return frame
+
+
+def redraws_per_second(frame, seconds, max_frames=200):
+    frame()
+    count = 0
+    start = time.perf_counter()
+    while count < max_frames:
+        frame()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed > seconds:
+            break
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live plot redraws")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000, 10_000_000],
+                        help="samples in the ring buffer")
+    parser.add_argument("--seconds", type=float, default=1.0,
+                        help="how long to redraw each case")
+    args = parser.parse_args()
+
+    print(f"{'samples':>12} {'full draw':>12} {'blit':>12} {'downsample':>12}   redraws/s")
+    for size in args.sizes:
+        # The buffer holds 10 seconds of samples, 1/30 s arrives per frame
+        telemetry = Telemetry(rate=size // 10)
+        batch = max(size // 300, 1)
+        rates = []
+        for make in (lambda: full_draw(size, telemetry, batch),
+                     lambda: live(size, telemetry, batch, downsample=False),
+                     lambda: live(size, telemetry, batch, downsample=True)):
+            try:
+                rates.append(f"{redraws_per_second(make(), args.seconds):12.1f}")
+            except OverflowError:
+                # Agg refuses paths with too many vertices to rasterize
+                rates.append(f"{'too many':>12}")
+        print(f"{size:12,} {' '.join(rates)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# folder_scanner.py
+
+"""
+List the images in a folder in batches, remembering what was found
+
+Directories are read with os.scandir, which gets the file type along
+with the name instead of a stat call per file. Each directory's image
+names are kept with its modification time, which changes whenever a
+file is added, removed or renamed in it. Going back to a folder only
+rereads the directories that changed since the last visit. A directory
+that is being read hands out its names in batches as they arrive, so
+the first ones can be shown before a big folder is fully listed.
+"""
+
+import json
+import os
+import threading
+
+from thumbnails import CACHE_DIR
+
+IMAGE_EXTENSIONS = (".png", ".gif", ".jpg", ".jpeg")
+INDEX_PATH = CACHE_DIR / "folders.json"
+
+
+def read_directory(path, extensions, batch_size=500):
+    """
+    Yield (image names, subdirectory names) while the directory is read
+
+    Names come in the order os.scandir returns them, a batch at a time,
+    so a huge directory shows its first files long before the last ones
+    have been listed
+    """
+    files = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                # Broken links and entries removed while reading
+                continue
+            if len(files) == batch_size:
+                yield files, subdirs
+                files = []
+                subdirs = []
+    if files or subdirs:
+        yield files, subdirs
+
+
+class FolderIndex:
+
+    def __init__(self, path=INDEX_PATH, extensions=IMAGE_EXTENSIONS):
+        self.path = path
+        self.extensions = extensions
+        # Absolute directory -> [mtime_ns, image names, subdirectory names]
+        self.dirs = {}
+        self.errors = []
+        # Held by whichever thread is scanning, so an old scan that is
+        # still stopping can't interleave with a new one
+        self.lock = threading.Lock()
+        if path is not None:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as index_file:
+                self.dirs = json.load(index_file)
+        except (OSError, ValueError):
+            self.dirs = {}
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump(self.dirs, index_file)
+        os.replace(tmp_path, self.path)
+
+    def directory(self, path, batch_size=500):
+        """
+        Yield (image names, subdirectory names) batches, rereading only if it changed
+
+        A directory is only cached, sorted, once it has been read to the end
+        """
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.dirs.get(path)
+        if cached is not None and cached[0] == mtime:
+            files = cached[1]
+            for start in range(0, len(files), batch_size):
+                yield files[start:start + batch_size], []
+            yield [], cached[2]
+            return
+        all_files = []
+        all_subdirs = []
+        for files, subdirs in read_directory(path, self.extensions, batch_size):
+            all_files += files
+            all_subdirs += subdirs
+            yield files, subdirs
+        self.dirs[path] = [mtime, sorted(all_files), sorted(all_subdirs)]
+
+    def scan(self, folder, recursive=False, batch_size=500, stop=None):
+        """
+        Yield lists of image paths relative to folder, batch_size at a time
+
+        Directories that can't be read are skipped and listed in errors.
+        Directories that weren't cached come out unsorted.
+        """
+        folder = os.path.abspath(folder)
+        self.errors = []
+        batch = []
+        pending = [folder]
+        while pending:
+            path = pending.pop()
+            relative = os.path.relpath(path, folder)
+            found = []
+            try:
+                for files, subdirs in self.directory(path, batch_size):
+                    if stop is not None and stop.is_set():
+                        return
+                    found += subdirs
+                    for name in files:
+                        batch.append(name if relative == "." else os.path.join(relative, name))
+                        if len(batch) == batch_size:
+                            yield batch
+                            batch = []
+            except OSError as error:
+                self.errors.append(error)
+                continue
+            if recursive:
+                # Reversed so the stack hands them back in sorted order
+                pending.extend(os.path.join(path, name) for name in sorted(found, reverse=True))
+        if batch:
+            yield batch
+
+    def files(self, folder, recursive=False):
+        return {name for batch in self.scan(folder, recursive) for name in batch}
+
+
+def watch(index, folder, recursive, on_change, stop, interval=2.0):
+    """
+    Check the folder every interval seconds until stop is set
+
+    on_change(added, removed) gets the relative paths that appeared and
+    disappeared. Only directories whose mtime changed are read again.
+    """
+    with index.lock:
+        known = index.files(folder, recursive)
+    while not stop.wait(interval):
+        with index.lock:
+            current = index.files(folder, recursive)
+            if current == known:
+                continue
+            index.save()
+        on_change(sorted(current - known), sorted(known - current))
+        known = current
+
+
+def scan_in_background(index, folder, recursive, on_batch, on_done, on_change=None,
+                       batch_size=500):
+    """
+    Scan a folder in a thread, then keep watching it if on_change is given
+
+    Returns an event; set it to stop the scan and the watching
+    """
+    stop = threading.Event()
+
+    def run():
+        count = 0
+        with index.lock:
+            for batch in index.scan(folder, recursive, batch_size, stop):
+                count += len(batch)
+                on_batch(batch)
+            if stop.is_set():
+                return
+            index.save()
+            errors = index.errors
+        on_done(count, errors)
+        if on_change is not None:
+            watch(index, folder, recursive, on_change, stop)
+
+    threading.Thread(target=run, daemon=True).start()
+    return stop
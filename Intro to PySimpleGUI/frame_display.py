@@ -0,0 +1,122 @@
+# frame_display.py
+
+"""
+Show OpenCV frames in an sg.Image without compressing them
+
+Tk reads binary PPM (color) and PGM (grayscale) images, which are just
+a short header followed by the raw pixels. The pixels are converted
+from BGR straight into a buffer that is reused for every frame, and
+the same Tk PhotoImage is refilled instead of making a new one.
+"""
+
+import time
+import tkinter as tk
+
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FrameEncoder:
+    """
+    Turn frames into PPM/PGM bytes, reusing the pixel buffer
+    """
+
+    def __init__(self):
+        self.shape = None
+        self.header = b""
+        self.pixels = None
+
+    def encode(self, frame):
+        if frame.shape != self.shape:
+            height, width = frame.shape[:2]
+            magic = "P5" if frame.ndim == 2 else "P6"
+            self.header = f"{magic} {width} {height} 255\n".encode()
+            self.pixels = np.empty(frame.shape, dtype=np.uint8)
+            self.shape = frame.shape
+        if frame.ndim == 2:
+            np.copyto(self.pixels, frame)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.pixels)
+        return self.pixels
+
+    def to_bytes(self):
+        return self.header + self.pixels.tobytes()
+
+
+class FrameDisplay:
+    """
+    Show frames in an sg.Image through a single reused PhotoImage
+    """
+
+    def __init__(self, image_element):
+        self.element = image_element
+        self.encoder = FrameEncoder()
+        self.photo = None
+        self.size = None
+
+    def show(self, data, size):
+        """
+        Put encoded PPM/PGM data of the given (width, height) on screen
+        """
+        if self.photo is None or size != self.size:
+            self.photo = tk.PhotoImage(master=self.element.Widget, data=data)
+            self.element.Widget.configure(image=self.photo, width=size[0], height=size[1])
+            self.size = size
+        else:
+            self.photo.configure(data=data)
+
+
+def png_bytes(frame):
+    # The old display path, kept for comparison
+    return cv2.imencode(".png", frame)[1].tobytes()
+
+
+class FrameStats:
+    """
+    Smoothed time per stage plus the frame rate, for the overlay
+    """
+
+    def __init__(self, smoothing=0.9, window=30):
+        self.smoothing = smoothing
+        self.times = {}
+        self.counts = {}
+        self.frame_ends = deque(maxlen=window)
+
+    def add(self, stage, seconds):
+        old = self.times.get(stage, seconds)
+        self.times[stage] = old * self.smoothing + seconds * (1 - self.smoothing)
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def frame_done(self):
+        self.frame_ends.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        if len(self.frame_ends) < 2:
+            return 0.0
+        return (len(self.frame_ends) - 1) / (self.frame_ends[-1] - self.frame_ends[0])
+
+    def lines(self):
+        lines = [f"{self.fps:5.1f} fps"]
+        lines += [f"{stage} {seconds * 1000:5.1f} ms" for stage, seconds in self.times.items()]
+        lines += [f"{name} {value}" for name, value in self.counts.items()]
+        return lines
+
+    def draw(self, pixels, bgr=False):
+        """
+        Write the stats in yellow in the top left corner of an image
+
+        The image is changed in place; pass bgr=True for OpenCV frames
+        """
+        if pixels.ndim == 2:
+            color = 255
+        else:
+            color = (0, 255, 255) if bgr else (255, 255, 0)
+        for row, line in enumerate(self.lines()):
+            position = (10, 20 + row * 18)
+            cv2.putText(pixels, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 0, 3)
+            cv2.putText(pixels, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
@@ -0,0 +1,196 @@
+# frame_filters.py
+
+"""
+The filters of the OpenCV demo as objects that keep their state
+
+Each filter keeps the things that are expensive to make, such as the
+CLAHE object and the hue lookup table, and only rebuilds them when its
+slider moves. Every intermediate and output image is written into a
+buffer allocated on the first frame and reused after that.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+
+def apply_filter(frame, values):
+    """
+    Apply the filter selected in the window to a BGR frame
+
+    This is the original version that allocates new images on every
+    frame. It is kept to compare against in bench_filters.py
+    """
+    if values["-THRESH-"]:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)[:, :, 0]
+        frame = cv2.threshold(
+            frame, values["-THRESH SLIDER-"], 255, cv2.THRESH_BINARY
+        )[1]
+    elif values["-CANNY-"]:
+        frame = cv2.Canny(
+            frame, values["-CANNY SLIDER A-"], values["-CANNY SLIDER B-"]
+        )
+    elif values["-BLUR-"]:
+        frame = cv2.GaussianBlur(frame, (21, 21), values["-BLUR SLIDER-"])
+    elif values["-HUE-"]:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        frame[:, :, 0] += int(values["-HUE SLIDER-"])
+        frame = cv2.cvtColor(frame, cv2.COLOR_HSV2BGR)
+    elif values["-ENHANCE-"]:
+        enh_val = values["-ENHANCE SLIDER-"] / 40
+        clahe = cv2.createCLAHE(clipLimit=enh_val, tileGridSize=(8, 8))
+        lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
+        lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+        frame = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+    return frame
+
+
+class Filter:
+    """
+    Base class with buffers that live as long as the filter
+
+    Outputs rotate through a few buffers, because a filtered frame can
+    still be waiting in the pipeline's result queue, or being shown,
+    while the next one is filtered.
+    """
+
+    def __init__(self, outputs=4):
+        self.outputs = outputs
+        self.buffers = {}
+        self.turn = 0
+
+    def buffer(self, name, shape):
+        array = self.buffers.get(name)
+        if array is None or array.shape != shape:
+            array = self.buffers[name] = np.empty(shape, dtype=np.uint8)
+        return array
+
+    def output(self, shape):
+        self.turn = (self.turn + 1) % self.outputs
+        return self.buffer(f"output {self.turn}", shape)
+
+    def apply(self, frame, values):
+        raise NotImplementedError
+
+
+class Threshold(Filter):
+
+    def apply(self, frame, values):
+        lab = self.buffer("lab", frame.shape)
+        lightness = self.buffer("lightness", frame.shape[:2])
+        dst = self.output(frame.shape[:2])
+        cv2.cvtColor(frame, cv2.COLOR_BGR2LAB, dst=lab)
+        cv2.extractChannel(lab, 0, dst=lightness)
+        cv2.threshold(lightness, values["-THRESH SLIDER-"], 255, cv2.THRESH_BINARY, dst=dst)
+        return dst
+
+
+class Canny(Filter):
+
+    def apply(self, frame, values):
+        dst = self.output(frame.shape[:2])
+        cv2.Canny(frame, values["-CANNY SLIDER A-"], values["-CANNY SLIDER B-"], edges=dst)
+        return dst
+
+
+class Blur(Filter):
+
+    def apply(self, frame, values):
+        dst = self.output(frame.shape)
+        cv2.GaussianBlur(frame, (21, 21), values["-BLUR SLIDER-"], dst=dst)
+        return dst
+
+
+class Hue(Filter):
+    """
+    Rotate the hue, wrapping around at 180 like OpenCV's 8-bit hue does
+
+    Adding to the uint8 hue channel wrapped at 256 instead, which
+    turned some colors into hues outside the 0-179 range.
+    """
+
+    def __init__(self, outputs=4):
+        super().__init__(outputs)
+        self.shift = None
+        self.table = None
+
+    def apply(self, frame, values):
+        shift = int(values["-HUE SLIDER-"])
+        if shift != self.shift:
+            hues = np.arange(256)
+            self.table = np.where(hues < 180, (hues + shift) % 180, hues).astype(np.uint8)
+            self.shift = shift
+        hsv = self.buffer("hsv", frame.shape)
+        hue = self.buffer("hue", frame.shape[:2])
+        dst = self.output(frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
+        cv2.extractChannel(hsv, 0, dst=hue)
+        cv2.LUT(hue, self.table, dst=hue)
+        cv2.insertChannel(hue, hsv, 0)
+        cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR, dst=dst)
+        return dst
+
+
+class Enhance(Filter):
+    """
+    Contrast limited histogram equalization of the lightness channel
+    """
+
+    def __init__(self, outputs=4):
+        super().__init__(outputs)
+        self.clahe = cv2.createCLAHE(tileGridSize=(8, 8))
+        self.clip_limit = None
+
+    def apply(self, frame, values):
+        clip_limit = values["-ENHANCE SLIDER-"] / 40
+        if clip_limit != self.clip_limit:
+            self.clahe.setClipLimit(clip_limit)
+            self.clip_limit = clip_limit
+        lab = self.buffer("lab", frame.shape)
+        lightness = self.buffer("lightness", frame.shape[:2])
+        equalized = self.buffer("equalized", frame.shape[:2])
+        dst = self.output(frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2LAB, dst=lab)
+        cv2.extractChannel(lab, 0, dst=lightness)
+        self.clahe.apply(lightness, dst=equalized)
+        cv2.insertChannel(equalized, lab, 0)
+        cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=dst)
+        return dst
+
+
+# Radio button key -> filter class, checked in this order
+FILTERS = {
+    "-THRESH-": Threshold,
+    "-CANNY-": Canny,
+    "-BLUR-": Blur,
+    "-HUE-": Hue,
+    "-ENHANCE-": Enhance,
+}
+
+
+class FrameFilters:
+    """
+    Apply the filter selected in the window, like apply_filter()
+
+    Filter threads can share one FrameFilters: each thread gets its own
+    filter objects, so no two threads write to the same buffers.
+    """
+
+    def __init__(self, outputs=4):
+        self.outputs = outputs
+        self.local = threading.local()
+
+    def filter_for(self, key):
+        filters = getattr(self.local, "filters", None)
+        if filters is None:
+            filters = self.local.filters = {}
+        if key not in filters:
+            filters[key] = FILTERS[key](self.outputs)
+        return filters[key]
+
+    def __call__(self, frame, values):
+        for key in FILTERS:
+            if values[key]:
+                return self.filter_for(key).apply(frame, values)
+        return frame
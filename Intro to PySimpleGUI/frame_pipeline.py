@@ -0,0 +1,210 @@
+# frame_pipeline.py
+
+"""
+Capture, filter and display frames in separate threads
+
+The capture thread reads as fast as the source delivers and keeps only
+the newest frames, so the camera's own buffer never fills up with old
+ones. Filter threads take the newest captured frame, and the GUI shows
+the newest result. Every queue is bounded and drops its oldest entry
+when full, so a slow stage skips frames instead of adding latency.
+"""
+
+import threading
+import time
+
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+Result = namedtuple("Result", ["number", "captured", "filter_time", "frame"])
+
+
+class LatestQueue:
+    """
+    A bounded queue that drops the oldest item to make room
+    """
+
+    def __init__(self, maxsize=1):
+        self.items = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Wait for the oldest item, returning None on timeout or close
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            return self.items.popleft() if self.items else None
+
+    def get_latest(self):
+        """
+        Take everything without waiting and return only the newest item
+        """
+        with self.condition:
+            if not self.items:
+                return None
+            self.dropped += len(self.items) - 1
+            item = self.items[-1]
+            self.items.clear()
+            return item
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class SyntheticSource:
+    """
+    A moving test pattern with a frame counter, paced like a camera
+    """
+
+    def __init__(self, width=640, height=480, fps=30):
+        self.width = width
+        self.height = height
+        self.interval = 1 / fps if fps else 0
+        self.count = 0
+        self.next_frame = time.perf_counter()
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        self.base = np.dstack([np.broadcast_to(x, (height, width)),
+                               np.broadcast_to(y, (height, width)),
+                               np.full((height, width), 128, np.float32)]).astype(np.uint8)
+
+    def read(self):
+        if self.interval:
+            delay = self.next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame = max(self.next_frame + self.interval, time.perf_counter())
+        frame = np.roll(self.base, self.count * 4, axis=1)
+        cv2.circle(frame, (self.count * 7 % self.width, self.height // 2), 40,
+                   (0, 0, 255), -1)
+        cv2.putText(frame, f"frame {self.count}", (10, self.height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self.count += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class VideoFileSource:
+    """
+    Play a video file at its own frame rate, starting over at the end
+    """
+
+    def __init__(self, path, realtime=True, loop=True):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise OSError(f"cannot open video {path}")
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 30
+        self.interval = 1 / fps if realtime else 0
+        self.loop = loop
+        self.next_frame = time.perf_counter()
+
+    def read(self):
+        if self.interval:
+            delay = self.next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame = max(self.next_frame + self.interval, time.perf_counter())
+        ret, frame = self.capture.read()
+        if not ret and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return ret, frame
+
+    def release(self):
+        self.capture.release()
+
+
+def open_source(source):
+    """
+    A camera number, "synthetic" or the path of a video file
+    """
+    if str(source).isdigit():
+        return cv2.VideoCapture(int(source))
+    if source == "synthetic":
+        return SyntheticSource()
+    return VideoFileSource(source)
+
+
+class FramePipeline:
+    """
+    Run process(frame, params) on the newest frames of a source
+
+    Set params from the GUI thread whenever the controls change; each
+    frame is filtered with whatever params were current when it started.
+    """
+
+    def __init__(self, source, process, params, workers=1, queue_size=2):
+        self.source = source
+        self.process = process
+        self.params = params
+        self.captured = LatestQueue(1)
+        self.results = LatestQueue(queue_size)
+        self.running = True
+        self.last_shown = -1
+        self.threads = [threading.Thread(target=self.capture_frames, daemon=True)]
+        self.threads += [threading.Thread(target=self.filter_frames, daemon=True)
+                         for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def capture_frames(self):
+        number = 0
+        while self.running:
+            ret, frame = self.source.read()
+            if not ret:
+                break
+            self.captured.put((number, time.perf_counter(), frame))
+            number += 1
+        self.captured.close()
+
+    def filter_frames(self):
+        while self.running:
+            item = self.captured.get(timeout=0.1)
+            if item is None:
+                if self.captured.closed:
+                    break
+                continue
+            number, captured, frame = item
+            start = time.perf_counter()
+            frame = self.process(frame, self.params)
+            self.results.put(Result(number, captured, time.perf_counter() - start, frame))
+
+    def latest(self):
+        """
+        The newest filtered frame not shown yet, or None
+        """
+        result = self.results.get_latest()
+        # With several filter threads a newer frame can finish first
+        if result is None or result.number <= self.last_shown:
+            return None
+        self.last_shown = result.number
+        return result
+
+    @property
+    def dropped(self):
+        return self.captured.dropped + self.results.dropped
+
+    def stop(self):
+        self.running = False
+        self.captured.close()
+        self.results.close()
+        for thread in self.threads:
+            thread.join(timeout=1)
+        self.source.release()
@@ -3,6 +3,12 @@
 import PySimpleGUI as sg
 import os.path
 
+from folder_scanner import FolderIndex, scan_in_background
+from thumbnails import ThumbnailCache
+
+# How many entries above and below the selection to load ahead of time
+PREFETCH = 4
+
 
 # First the window layout in 2 columns
 file_list_column = [
@@ -11,6 +17,7 @@ file_list_column = [
         sg.In(size=(25, 1), enable_events=True, key="-FOLDER-"),
         sg.FolderBrowse(),
     ],
+    [sg.Checkbox("Include subfolders", enable_events=True, key="-RECURSIVE-")],
     [sg.Listbox(values=[], enable_events=True, size=(40, 20), key="-FILE LIST-")],
 ]
 
@@ -33,6 +40,26 @@ layout = [
 
 
 window = sg.Window("Image Viewer", layout)
+thumbnails = ThumbnailCache()
+folder_index = FolderIndex()
+fnames = []
+# Each scan gets a number so events from an older scan can be ignored
+scan_id = 0
+stop_scan = None
+shown = 0
+
+
+def post(event, scan):
+    return lambda *args: window.write_event_value(event, (scan,) + args)
+
+
+def show_file_list():
+    global shown
+    selected = window["-FILE LIST-"].get()
+    window["-FILE LIST-"].update(fnames)
+    if selected and selected[0] in fnames:
+        window["-FILE LIST-"].set_value(selected)
+    shown = len(fnames)
 
 
 # Run the Event Loop
@@ -43,31 +70,80 @@ while True:
     if event == "Exit" or event == sg.WIN_CLOSED:
         break
 
-    # Folder name was filled in, make a list of files in the folder
-    if event == "-FOLDER-":
+    # Folder name was filled in, list the images in it as they are found
+    if event in ("-FOLDER-", "-RECURSIVE-"):
         folder = values["-FOLDER-"]
-        try:
-            # Get list of files in folder
-            file_list = os.listdir(folder)
-        except:
-            file_list = []
-
-        fnames = [
-            f
-            for f in file_list
-            if os.path.isfile(os.path.join(folder, f))
-            and f.lower().endswith((".png", ".gif"))
-        ]
-
-        window["-FILE LIST-"].update(fnames)
-
-    elif event == "-FILE LIST-":  # A file was chosen from the listbox
-
-        try:
-            filename = os.path.join(values["-FOLDER-"], values["-FILE LIST-"][0])
-            window["-TOUT-"].update(filename)
-            window["-IMAGE-"].update(filename=filename)
-        except:
-            pass
-
+        if stop_scan is not None:
+            stop_scan.set()
+        fnames = []
+        show_file_list()
+        if os.path.isdir(folder):
+            scan_id += 1
+            window["-TOUT-"].update("Scanning...")
+            stop_scan = scan_in_background(
+                folder_index, folder, values["-RECURSIVE-"],
+                on_batch=post("-SCAN BATCH-", scan_id),
+                on_done=post("-SCAN DONE-", scan_id),
+                on_change=post("-FOLDER CHANGED-", scan_id),
+            )
+        else:
+            window["-TOUT-"].update(f"Not a folder: {folder}")
+
+    elif event == "-SCAN BATCH-" and values[event][0] == scan_id:
+        fnames.extend(values[event][1])
+        # Refilling the listbox costs as much as its length, so only do
+        # it when the list has doubled
+        if len(fnames) >= 2 * shown:
+            show_file_list()
+
+    elif event == "-SCAN DONE-" and values[event][0] == scan_id:
+        _, count, errors = values[event]
+        # Folders read for the first time arrive in directory order
+        fnames.sort()
+        show_file_list()
+        message = f"{count} images"
+        if errors:
+            message += f", {len(errors)} folders could not be read: {errors[0]}"
+        window["-TOUT-"].update(message)
+
+    elif event == "-FOLDER CHANGED-" and values[event][0] == scan_id:
+        _, added, removed = values[event]
+        removed = set(removed)
+        fnames = sorted([name for name in fnames if name not in removed] + added)
+        show_file_list()
+
+    elif event == "-FILE LIST-" and values["-FILE LIST-"]:  # A file was chosen
+        filename = os.path.join(values["-FOLDER-"], values["-FILE LIST-"][0])
+        window["-TOUT-"].update(filename)
+        data = thumbnails.get(filename)
+        if data is not None:
+            window["-IMAGE-"].update(data=data)
+        else:
+            future = thumbnails.submit(filename)
+            future.add_done_callback(
+                lambda done, filename=filename: window.write_event_value(
+                    "-THUMBNAIL-", (filename, done))
+            )
+
+        # Load the neighbours too, so moving through the list is instant
+        index = window["-FILE LIST-"].get_indexes()[0]
+        neighbours = []
+        for offset in range(1, PREFETCH + 1):
+            for neighbour in (index + offset, index - offset):
+                if 0 <= neighbour < len(fnames):
+                    neighbours.append(os.path.join(values["-FOLDER-"], fnames[neighbour]))
+        thumbnails.prefetch([filename] + neighbours)
+
+    elif event == "-THUMBNAIL-":  # A background load finished
+        filename, future = values["-THUMBNAIL-"]
+        # Only show it if it is still the selected file
+        if filename == window["-TOUT-"].get() and not future.cancelled():
+            if future.exception() is None:
+                window["-IMAGE-"].update(data=future.result())
+            else:
+                window["-TOUT-"].update(f"{filename}: {future.exception()}")
+
+if stop_scan is not None:
+    stop_scan.set()
+thumbnails.close()
 window.close()
@@ -0,0 +1,179 @@
+# live_plot.py
+
+"""
+Plot a stream of samples at tens of frames per second with matplotlib
+
+Samples go into a fixed size ring buffer. Before drawing, the newest
+span of samples is reduced to the lowest and highest value in each
+pixel column, so a line never has many more points than the canvas is
+wide, however many samples are kept. Only the line is redrawn for each
+frame: the axes, ticks and labels are drawn once, saved, and pasted
+back behind the line (blitting). The x axis shows seconds before the
+newest sample, so it never moves and the saved background stays valid.
+"""
+
+import time
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    The last capacity (x, y) samples, kept in two preallocated arrays
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.x = np.empty(capacity)
+        self.y = np.empty(capacity)
+        self.end = 0
+        self.size = 0
+
+    def extend(self, xs, ys):
+        xs = np.asarray(xs, dtype=float)[-self.capacity:]
+        ys = np.asarray(ys, dtype=float)[-self.capacity:]
+        count = len(xs)
+        first = min(count, self.capacity - self.end)
+        self.x[self.end:self.end + first] = xs[:first]
+        self.y[self.end:self.end + first] = ys[:first]
+        # Whatever does not fit before the end wraps around to the start
+        self.x[:count - first] = xs[first:]
+        self.y[:count - first] = ys[first:]
+        self.end = (self.end + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def segments(self):
+        """
+        The samples oldest first, as one or two (x, y) views without copying
+        """
+        start = (self.end - self.size) % self.capacity
+        if start + self.size <= self.capacity:
+            parts = [slice(start, start + self.size)]
+        else:
+            parts = [slice(start, self.capacity), slice(0, self.end)]
+        return [(self.x[part], self.y[part]) for part in parts if part.stop > part.start]
+
+    def last_x(self):
+        return self.x[self.end - 1] if self.size else 0.0
+
+
+def min_max_downsample(x, y, x_min, x_max, columns):
+    """
+    Keep the lowest and highest y of every pixel column between x_min and x_max
+
+    x must be sorted. Returns at most 2 * columns points that draw the
+    same picture as all of them: each column becomes a vertical stroke
+    from its minimum to its maximum.
+    """
+    lo = np.searchsorted(x, x_min)
+    hi = np.searchsorted(x, x_max, side="right")
+    x, y = x[lo:hi], y[lo:hi]
+    if len(x) <= 2 * columns:
+        return x, y
+    edges = np.linspace(x_min, x_max, columns + 1)
+    starts = np.searchsorted(x, edges[:-1])
+    starts = np.unique(starts[starts < len(x)])
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    # The stroke runs at the x of the first sample in the column
+    xs = np.repeat(x[starts], 2)
+    ys = np.empty(len(xs))
+    ys[0::2] = lows
+    ys[1::2] = highs
+    return xs, ys
+
+
+class LivePlot:
+    """
+    A line showing the last span seconds of a ring buffer, blitted
+
+    Call update() after adding samples; the y axis grows when a sample
+    falls outside it, which costs one full redraw.
+    """
+
+    def __init__(self, axes, capacity=100_000, span=10.0, ylim=(-1, 1), downsample=True):
+        self.axes = axes
+        self.canvas = axes.figure.canvas
+        self.buffer = RingBuffer(capacity)
+        self.span = span
+        self.downsample = downsample
+        (self.line,) = axes.plot([], [], animated=True, linewidth=1)
+        axes.set_xlim(-span, 0)
+        axes.set_ylim(*ylim)
+        axes.set_xlabel("seconds ago")
+        self.background = None
+        self.points = 0
+        self.canvas.mpl_connect("draw_event", self.save_background)
+
+    def save_background(self, event=None):
+        # Called after every full draw, including window resizes
+        self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self.axes.draw_artist(self.line)
+
+    def add(self, xs, ys):
+        self.buffer.extend(xs, ys)
+
+    def line_data(self):
+        newest = self.buffer.last_x()
+        columns = max(int(self.axes.bbox.width), 1)
+        xs, ys = [], []
+        for x, y in self.buffer.segments():
+            if self.downsample:
+                x, y = min_max_downsample(x, y, newest - self.span, newest, columns)
+            xs.append(x - newest)
+            ys.append(y)
+        if not xs:
+            return np.empty(0), np.empty(0)
+        return np.concatenate(xs), np.concatenate(ys)
+
+    def rescale(self, ys):
+        bottom, top = self.axes.get_ylim()
+        if not len(ys) or (ys.min() >= bottom and ys.max() <= top):
+            return False
+        margin = (ys.max() - ys.min()) * 0.1 or 1
+        self.axes.set_ylim(min(bottom, ys.min() - margin), max(top, ys.max() + margin))
+        return True
+
+    def update(self):
+        """
+        Redraw the line and return how long it took in seconds
+        """
+        start = time.perf_counter()
+        xs, ys = self.line_data()
+        self.line.set_data(xs, ys)
+        self.points = len(xs)
+        if self.background is None or self.rescale(ys):
+            # New ticks: draw everything, which saves a new background
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.axes.draw_artist(self.line)
+            self.canvas.blit(self.axes.bbox)
+        self.canvas.flush_events()
+        return time.perf_counter() - start
+
+
+class Telemetry:
+    """
+    A fake sensor: a few sine waves plus noise, sampled at rate per second
+    """
+
+    def __init__(self, rate=10_000):
+        self.rate = rate
+        self.start = time.perf_counter()
+        self.sent = 0
+        self.random = np.random.default_rng(0)
+
+    def samples(self, count):
+        t = (self.sent + np.arange(count)) / self.rate
+        y = (np.sin(2 * np.pi * 0.5 * t) + 0.3 * np.sin(2 * np.pi * 7 * t)
+             + self.random.normal(0, 0.05, count))
+        self.sent += count
+        return t, y
+
+    def read(self):
+        """
+        All the samples that would have arrived since the last read
+        """
+        due = int((time.perf_counter() - self.start) * self.rate)
+        return self.samples(max(due - self.sent, 0))
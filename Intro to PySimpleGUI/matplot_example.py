@@ -1,11 +1,11 @@
+import argparse
 import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import PySimpleGUI as sg
 import matplotlib
+import matplotlib.figure
 
-fig = matplotlib.figure.Figure(figsize=(5, 4), dpi=100)
-t = np.arange(0, 3, .01)
-fig.add_subplot(111).plot(t, 2 * np.sin(2 * np.pi * t))
+from live_plot import LivePlot, Telemetry
 
 matplotlib.use("TkAgg")
 
@@ -15,25 +15,71 @@ def draw_figure(canvas, figure):
     figure_canvas_agg.get_tk_widget().pack(side="top", fill="both", expand=1)
     return figure_canvas_agg
 
-# Define the window layout
-layout = [
-    [sg.Text("Plot test")],
-    [sg.Canvas(key="-CANVAS-")],
-    [sg.Button("Ok")],
-]
-
-# Create the form and show it without the plot
-window = sg.Window(
-    "Matplotlib Single Graph",
-    layout,
-    location=(0, 0),
-    finalize=True,
-    element_justification="center",
-    font="Helvetica 18",
-)
-
-# Add the plot to the window
-draw_figure(window["-CANVAS-"].TKCanvas, fig)
-event, values = window.read()
-
-window.close()
+
+def static_plot(window):
+    fig = matplotlib.figure.Figure(figsize=(5, 4), dpi=100)
+    t = np.arange(0, 3, .01)
+    fig.add_subplot(111).plot(t, 2 * np.sin(2 * np.pi * t))
+
+    # Add the plot to the window
+    draw_figure(window["-CANVAS-"].TKCanvas, fig)
+    window.read()
+
+
+def live_plot(window, rate, capacity, span, downsample):
+    fig = matplotlib.figure.Figure(figsize=(8, 4), dpi=100)
+    draw_figure(window["-CANVAS-"].TKCanvas, fig)
+    # The first update() draws the whole figure again, axes included
+    plot = LivePlot(fig.add_subplot(111), capacity, span, downsample=downsample)
+    telemetry = Telemetry(rate)
+    redraw = 0.0
+
+    while True:
+        event, values = window.read(timeout=10)
+        if event in ("Ok", sg.WIN_CLOSED):
+            break
+        plot.add(*telemetry.read())
+        redraw = redraw * 0.9 + plot.update() * 0.1
+        window["-STATUS-"].update(
+            f"{plot.buffer.size:,} samples, {plot.points:,} drawn, "
+            f"redraw {redraw * 1000:.1f} ms"
+        )
+
+
+def main(live=False, rate=10_000, capacity=1_000_000, span=10.0, downsample=True):
+    # Define the window layout
+    layout = [
+        [sg.Text("Plot test")],
+        [sg.Canvas(key="-CANVAS-")],
+        [sg.Text("", size=(50, 1), key="-STATUS-", font="Helvetica 12")],
+        [sg.Button("Ok")],
+    ]
+
+    # Create the form and show it without the plot
+    window = sg.Window(
+        "Matplotlib Live Graph" if live else "Matplotlib Single Graph",
+        layout,
+        location=(0, 0),
+        finalize=True,
+        element_justification="center",
+        font="Helvetica 18",
+    )
+
+    if live:
+        live_plot(window, rate, capacity, span, downsample)
+    else:
+        static_plot(window)
+    window.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Matplotlib in PySimpleGUI")
+    parser.add_argument("--live", action="store_true", help="stream fake telemetry")
+    parser.add_argument("--rate", type=int, default=10_000, help="samples per second")
+    parser.add_argument("--capacity", type=int, default=1_000_000,
+                        help="samples kept in the ring buffer")
+    parser.add_argument("--span", type=float, default=10.0, help="seconds shown")
+    parser.add_argument("--no-downsample", action="store_true",
+                        help="draw every sample, to compare")
+    args = parser.parse_args()
+    main(args.live, args.rate, args.capacity, args.span, not args.no_downsample)
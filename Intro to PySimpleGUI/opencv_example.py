@@ -1,9 +1,39 @@
 import PySimpleGUI as sg
-import cv2
-import numpy as np
+import argparse
+import time
 
+from frame_display import FrameDisplay, FrameStats, png_bytes
+from frame_filters import FrameFilters
+from frame_pipeline import FramePipeline, open_source
 
-def main():
+
+def show_frame(window, display, stats, frame, values):
+    """
+    Encode a filtered frame, put it on screen and record both times
+    """
+    start = time.perf_counter()
+    if values["-DISPLAY-"] == "PNG":
+        if values["-STATS-"]:
+            # The frame may still be in use, e.g. as a filter's buffer
+            frame = frame.copy()
+            stats.draw(frame, bgr=True)
+        imgbytes = png_bytes(frame)
+        encoded = time.perf_counter()
+        window["-IMAGE-"].update(data=imgbytes)
+        # The element has a new PhotoImage now
+        display.photo = None
+    else:
+        pixels = display.encoder.encode(frame)
+        if values["-STATS-"]:
+            stats.draw(pixels)
+        imgbytes = display.encoder.to_bytes()
+        encoded = time.perf_counter()
+        display.show(imgbytes, (frame.shape[1], frame.shape[0]))
+    stats.add("encode", encoded - start)
+    stats.add("display", time.perf_counter() - encoded)
+
+
+def main(source="0", pipelined=False, workers=1):
     sg.theme("LightGreen")
 
     # Define the window layout
@@ -75,6 +105,12 @@ def main():
                 key="-ENHANCE SLIDER-",
             ),
         ],
+        [
+            sg.Text("Display"),
+            sg.Combo(["Raw PPM", "PNG"], default_value="Raw PPM", key="-DISPLAY-",
+                     readonly=True),
+            sg.Checkbox("Show timings", default=True, key="-STATS-"),
+        ],
         [sg.Button("Exit", size=(10, 1))],
     ]
 
@@ -82,39 +118,60 @@ def main():
     # Create the window and show it without the plot
     window = sg.Window("OpenCV Integration", layout, location=(800, 400))
 
-    cap = cv2.VideoCapture(0)
+    cap = open_source(source)
+    display = FrameDisplay(window["-IMAGE-"])
+    stats = FrameStats()
+    filters = FrameFilters()
+
+    if pipelined:
+        event, values = window.read(timeout=0)
+        pipeline = FramePipeline(cap, filters, values, workers)
+        while event not in ("Exit", sg.WIN_CLOSED):
+            # The filter threads pick up the new slider values
+            pipeline.params = values
+            result = pipeline.latest()
+            if result is not None:
+                stats.add("filter", result.filter_time)
+                show_frame(window, display, stats, result.frame, values)
+                stats.add("latency", time.perf_counter() - result.captured)
+                stats.count("dropped", pipeline.dropped)
+                stats.frame_done()
+            event, values = window.read(timeout=5)
+        pipeline.stop()
+        window.close()
+        return
 
     while True:
-        event, values = window.read(timeout=20)
+        # cap.read() waits for the next frame, so only poll the GUI here
+        event, values = window.read(timeout=1)
         if event == "Exit" or event == sg.WIN_CLOSED:
             break
 
+        start = time.perf_counter()
         ret, frame = cap.read()
+        if not ret:
+            continue
+        captured = time.perf_counter()
+        frame = filters(frame, values)
+        filtered = time.perf_counter()
+        show_frame(window, display, stats, frame, values)
 
-        if values["-THRESH-"]:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)[:, :, 0]
-            frame = cv2.threshold(
-                frame, values["-THRESH SLIDER-"], 255, cv2.THRESH_BINARY
-            )[1]
-        elif values["-CANNY-"]:
-            frame = cv2.Canny(
-                frame, values["-CANNY SLIDER A-"], values["-CANNY SLIDER B-"]
-            )
-        elif values["-BLUR-"]:
-            frame = cv2.GaussianBlur(frame, (21, 21), values["-BLUR SLIDER-"])
-        elif values["-HUE-"]:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            frame[:, :, 0] += int(values["-HUE SLIDER-"])
-            frame = cv2.cvtColor(frame, cv2.COLOR_HSV2BGR)
-        elif values["-ENHANCE-"]:
-            enh_val = values["-ENHANCE SLIDER-"] / 40
-            clahe = cv2.createCLAHE(clipLimit=enh_val, tileGridSize=(8, 8))
-            lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-            lab[:, :, 0] = clahe.apply(lab[:, :, 0])
-            frame = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-        imgbytes = cv2.imencode(".png", frame)[1].tobytes()
-        window["-IMAGE-"].update(data=imgbytes)
-        
+        stats.add("capture", captured - start)
+        stats.add("filter", filtered - captured)
+        stats.add("latency", time.perf_counter() - start)
+        stats.frame_done()
+
+    cap.release()
     window.close()
 
-main()
\ No newline at end of file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenCV filters in PySimpleGUI")
+    parser.add_argument("--source", default="0",
+                        help='camera number, "synthetic" or a video file')
+    parser.add_argument("--pipelined", action="store_true",
+                        help="capture, filter and display in separate threads")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="filter threads in pipelined mode")
+    args = parser.parse_args()
+    main(args.source, args.pipelined, args.workers)
@@ -0,0 +1,89 @@
+# test_folder_scanner.py
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import folder_scanner
+from folder_scanner import FolderIndex
+
+real_scandir = os.scandir
+
+
+class CountingScandir:
+    """
+    Wrap os.scandir and count how many entries have been handed out
+    """
+
+    def __init__(self):
+        self.read = 0
+        self.finished = False
+
+    def __call__(self, path):
+        scanner = self
+
+        class Entries:
+            def __enter__(self):
+                self.entries = real_scandir(path)
+                return self
+
+            def __exit__(self, *exc_info):
+                self.entries.close()
+
+            def __iter__(self):
+                for entry in self.entries:
+                    scanner.read += 1
+                    yield entry
+                scanner.finished = True
+
+        return Entries()
+
+
+class TestFolderIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        for number in range(1000):
+            open(os.path.join(self.folder.name, f"{number:04d}.png"), "wb").close()
+
+    def test_first_batch_before_listing_finishes(self):
+        """
+        The first batch of a big uncached directory arrives before
+        os.scandir has gone through every entry
+        """
+        scandir = CountingScandir()
+        index = FolderIndex(path=None)
+        with mock.patch.object(folder_scanner.os, "scandir", scandir):
+            batches = index.scan(self.folder.name, batch_size=100)
+            first = next(batches)
+            self.assertEqual(len(first), 100)
+            self.assertFalse(scandir.finished)
+            self.assertLess(scandir.read, 1000)
+            rest = [name for batch in batches for name in batch]
+        self.assertEqual(len(first) + len(rest), 1000)
+
+    def test_cached_directory_is_sorted(self):
+        """
+        Once a directory has been read to the end, rescans come from the
+        cache in sorted order
+        """
+        index = FolderIndex(path=None)
+        first = [name for batch in index.scan(self.folder.name) for name in batch]
+        with mock.patch.object(folder_scanner, "read_directory") as read_directory:
+            second = [name for batch in index.scan(self.folder.name) for name in batch]
+        read_directory.assert_not_called()
+        self.assertEqual(sorted(first), second)
+
+    def test_stopped_scan_is_not_cached(self):
+        """
+        A directory that was only partly read isn't cached
+        """
+        index = FolderIndex(path=None)
+        next(index.scan(self.folder.name, batch_size=100))
+        self.assertEqual(index.dirs, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# thumbnails.py
+
+"""
+Display sized copies of images, cached on disk and in memory
+
+The first time an image is shown it is decoded and scaled down once.
+The scaled copy is written to a cache folder under a name made from the
+path, modification time and size of the original, so an edited file
+gets a new entry. The most recently used images are also kept in memory
+already encoded for sg.Image, up to a limit in bytes.
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+CACHE_DIR = Path(os.environ.get("IMAGE_VIEWER_CACHE",
+                                Path.home() / ".cache" / "image_viewer"))
+DISPLAY_SIZE = 500
+
+
+def cache_key(path, size):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def display_data(image):
+    """
+    Encode an image for sg.Image
+
+    PPM is uncompressed, so it is quick to write and for Tk to read
+    """
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    bio = io.BytesIO()
+    image.save(bio, format="PPM")
+    return bio.getvalue()
+
+
+class ThumbnailCache:
+
+    def __init__(self, cache_dir=CACHE_DIR, size=DISPLAY_SIZE, memory_bytes=64 * 2**20,
+                 workers=2):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.size = size
+        # A 500 pixel PPM is about 750 KB, so 64 MB holds around 85 images
+        self.memory_bytes = memory_bytes
+        self.memory_used = 0
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.prefetching = {}
+
+    def get(self, path):
+        """
+        Return the display data if it is in memory, otherwise None
+        """
+        with self.lock:
+            data = self.memory.get(path)
+            if data is not None:
+                self.memory.move_to_end(path)
+            return data
+
+    def put(self, path, data):
+        with self.lock:
+            old = self.memory.pop(path, None)
+            if old is not None:
+                self.memory_used -= len(old)
+            self.memory[path] = data
+            self.memory_used += len(data)
+            # The newest entry stays even if it is bigger than the limit
+            while self.memory_used > self.memory_bytes and len(self.memory) > 1:
+                _, dropped = self.memory.popitem(last=False)
+                self.memory_used -= len(dropped)
+
+    def load(self, path):
+        """
+        Return the display data, from memory, the disk cache or the original
+        """
+        data = self.get(path)
+        if data is not None:
+            return data
+
+        cached_path = self.cache_dir / f"{cache_key(path, self.size)}.jpg"
+        try:
+            with Image.open(cached_path) as image:
+                data = display_data(image)
+        except OSError:
+            with Image.open(path) as image:
+                image.draft("RGB", (self.size, self.size))
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((self.size, self.size))
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+            # Write to a temporary name first so a reader never sees half a file
+            tmp_path = cached_path.with_suffix(f".{threading.get_ident()}.tmp")
+            image.save(tmp_path, format="JPEG", quality=90)
+            os.replace(tmp_path, cached_path)
+            data = display_data(image)
+        self.put(path, data)
+        return data
+
+    def submit(self, path):
+        """
+        Load an image in the background, returning a future for its data
+        """
+        future = self.prefetching.get(path)
+        if future is None or future.cancelled():
+            future = self.executor.submit(self.load, path)
+            self.prefetching[path] = future
+            future.add_done_callback(lambda done: self.forget(path, done))
+        return future
+
+    def forget(self, path, future):
+        if self.prefetching.get(path) is future:
+            del self.prefetching[path]
+
+    def prefetch(self, paths):
+        """
+        Load the given images in the background, most important first
+
+        Prefetches of images that are no longer wanted are cancelled if
+        they haven't started yet
+        """
+        wanted = set(paths)
+        for path, future in list(self.prefetching.items()):
+            if path not in wanted:
+                future.cancel()
+        for path in paths:
+            if self.get(path) is None:
+                self.submit(path)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,321 @@
+# video_processor.py
+
+"""
+Run the OpenCV demo filters over a video file on every core
+
+The video is cut into chunks of frames. A worker process seeks to the
+start of its chunk, filters it with the same slider values the demo
+uses and writes it to a lossless (FFV1) part file. Finished chunks are
+listed in a manifest beside the parts, so an interrupted run carries on
+where it stopped. Once every chunk is done the parts are joined, in
+order, into the output video, which is the only lossy encode:
+
+    python video_processor.py clip.mp4 edges.mp4 --filter canny --canny 100 200
+    python video_processor.py clip.mp4 warm.avi --filter enhance --filter hue --hue 20
+
+Filters given more than once are applied in that order.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+from frame_filters import FILTERS, Filter
+
+# Command line name -> radio button key in opencv_example.py
+FILTER_KEYS = {
+    "threshold": "-THRESH-",
+    "canny": "-CANNY-",
+    "blur": "-BLUR-",
+    "hue": "-HUE-",
+    "enhance": "-ENHANCE-",
+}
+CODECS = {".mp4": "mp4v", ".avi": "MJPG", ".mkv": "FFV1"}
+# Lossless, so joining the parts doesn't compress the frames twice
+PART_CODEC = "FFV1"
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def slider_values(threshold=128, canny=(128, 128), blur=1, hue=0, enhance=128):
+    """
+    The window values the filters read, defaulting to the demo's sliders
+    """
+    return {
+        "-THRESH SLIDER-": threshold,
+        "-CANNY SLIDER A-": canny[0],
+        "-CANNY SLIDER B-": canny[1],
+        "-BLUR SLIDER-": blur,
+        "-HUE SLIDER-": hue,
+        "-ENHANCE SLIDER-": enhance,
+    }
+
+
+class FilterChain(Filter):
+    """
+    Apply several filters in a row, always returning a BGR frame
+
+    Threshold and canny give grayscale frames, which are turned back
+    into BGR for the next filter and for the video writer.
+    """
+
+    def __init__(self, names, values):
+        super().__init__(outputs=1)
+        self.values = values
+        self.filters = [FILTERS[FILTER_KEYS[name]](outputs=1) for name in names]
+
+    def color(self, frame):
+        if frame.ndim == 3:
+            return frame
+        dst = self.buffer("color", frame.shape + (3,))
+        cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR, dst=dst)
+        return dst
+
+    def __call__(self, frame):
+        for step in self.filters:
+            frame = step.apply(self.color(frame), self.values)
+        return self.color(frame)
+
+
+def video_info(path):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise OSError(f"cannot open video {path}")
+    info = {
+        "frames": int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "fps": capture.get(cv2.CAP_PROP_FPS) or 30,
+        "size": (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                 int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))),
+    }
+    capture.release()
+    return info
+
+
+def part_name(number):
+    return f"{number:06d}.mkv"
+
+
+def process_chunk(source, parts_dir, number, start, count, names, values, fps, size):
+    """
+    Filter frames start to start + count into a part file, in a worker
+
+    The part is written under a temporary name and renamed when it is
+    complete, so a part file that exists is always a whole chunk.
+    """
+    began = time.perf_counter()
+    record = {"chunk": number}
+    path = os.path.join(parts_dir, part_name(number))
+    temporary = path + ".tmp.mkv"
+    capture = cv2.VideoCapture(source)
+    writer = cv2.VideoWriter(temporary, cv2.VideoWriter_fourcc(*PART_CODEC), fps, size)
+    chain = FilterChain(names, values)
+    frames = 0
+    try:
+        if not capture.isOpened():
+            raise OSError(f"cannot open video {source}")
+        if not writer.isOpened():
+            raise OSError(f"cannot write {temporary} with codec {PART_CODEC}")
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        while frames < count:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            writer.write(chain(frame))
+            frames += 1
+    except Exception as error:
+        record["error"] = f"{type(error).__name__}: {error}"
+    finally:
+        capture.release()
+        writer.release()
+    if "error" in record:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    else:
+        os.replace(temporary, path)
+    record["frames"] = frames
+    record["seconds"] = round(time.perf_counter() - began, 3)
+    return record
+
+
+def load_manifest(path, settings):
+    """
+    Return the chunks finished by an earlier run with the same settings
+    """
+    done = {}
+    try:
+        with open(path, encoding="utf-8") as manifest:
+            lines = iter(manifest)
+            header = json.loads(next(lines, "{}"))
+            if header.get("settings") != settings:
+                return {}
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short when the last run was interrupted
+                    continue
+                if "error" not in record:
+                    done[record["chunk"]] = record["frames"]
+    except (OSError, ValueError):
+        pass
+    return done
+
+
+def join_parts(parts, output, codec, fps, size):
+    """
+    Copy the frames of the part files, in order, into the output video
+    """
+    temporary = output + ".tmp" + os.path.splitext(output)[1]
+    writer = cv2.VideoWriter(temporary, cv2.VideoWriter_fourcc(*codec), fps, size)
+    if not writer.isOpened():
+        raise OSError(f"cannot write {output} with codec {codec}")
+    frames = 0
+    for part in parts:
+        capture = cv2.VideoCapture(part)
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            writer.write(frame)
+            frames += 1
+        capture.release()
+    writer.release()
+    os.replace(temporary, output)
+    return frames
+
+
+def format_eta(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def process_video(source, output, names, values, workers=None, chunk_frames=240,
+                  codec=None, restart=False, keep_parts=False, progress=None):
+    """
+    Filter a whole video into output and return a summary dict
+
+    progress(frames_done, total_frames, elapsed) is called after every chunk
+    """
+    info = video_info(source)
+    fps, size = info["fps"], info["size"]
+    codec = codec or CODECS.get(os.path.splitext(output)[1].lower(), "mp4v")
+    parts_dir = output + ".parts"
+    manifest_path = os.path.join(parts_dir, MANIFEST_NAME)
+    stat = os.stat(source)
+    settings = {"source": os.path.abspath(source), "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns, "filters": names, "values": values,
+                "chunk_frames": chunk_frames}
+
+    done = {} if restart else load_manifest(manifest_path, settings)
+    done = {number: frames for number, frames in done.items()
+            if os.path.exists(os.path.join(parts_dir, part_name(number)))}
+    if not done:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    chunks = range((info["frames"] + chunk_frames - 1) // chunk_frames)
+    todo = [number for number in chunks if number not in done]
+    total = info["frames"] - sum(done.values())
+    workers = workers or os.cpu_count() or 1
+    frames = failed = 0
+    start = time.perf_counter()
+
+    with open(manifest_path, "a" if done else "w", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        if not done:
+            manifest.write(json.dumps({"settings": settings}) + "\n")
+        pending = set()
+        remaining = iter(todo)
+        while True:
+            # Chunks are submitted a few at a time; each one is only a
+            # frame range, the frames themselves never leave the worker
+            while len(pending) < workers * 2:
+                number = next(remaining, None)
+                if number is None:
+                    break
+                pending.add(executor.submit(process_chunk, source, parts_dir, number,
+                                            number * chunk_frames, chunk_frames, names,
+                                            values, fps, size))
+            if not pending:
+                break
+            completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                record = future.result()
+                manifest.write(json.dumps(record) + "\n")
+                frames += record["frames"]
+                failed += "error" in record
+            manifest.flush()
+            if progress is not None:
+                progress(frames, total, time.perf_counter() - start)
+
+    filtered = time.perf_counter() - start
+    summary = {"frames": frames, "skipped_chunks": len(done), "failed_chunks": failed,
+               "seconds": filtered, "fps": frames / max(filtered, 1e-9), "output": None}
+    if failed:
+        return summary
+
+    parts = [os.path.join(parts_dir, part_name(number)) for number in chunks]
+    summary["written"] = join_parts(parts, output, codec, fps, size)
+    summary["output"] = output
+    summary["total_seconds"] = time.perf_counter() - start
+    if not keep_parts:
+        shutil.rmtree(parts_dir)
+    return summary
+
+
+def print_progress(frames, total, elapsed):
+    rate = frames / max(elapsed, 1e-9)
+    eta = (total - frames) / rate if rate else 0
+    print(f"\r{frames}/{total} frames, {rate:.1f} fps, ETA {format_eta(eta)}",
+          end="", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the OpenCV demo filters to a video")
+    parser.add_argument("input", help="video to read")
+    parser.add_argument("output", help="video to write, the codec follows the extension")
+    parser.add_argument("--filter", action="append", choices=list(FILTER_KEYS),
+                        help="filter to apply, can be given more than once")
+    parser.add_argument("--threshold", type=float, default=128)
+    parser.add_argument("--canny", type=float, nargs=2, default=(128, 128),
+                        metavar=("A", "B"))
+    parser.add_argument("--blur", type=float, default=1, help="blur sigma")
+    parser.add_argument("--hue", type=float, default=0, help="hue shift, 0-179")
+    parser.add_argument("--enhance", type=float, default=128,
+                        help="CLAHE clip limit times 40, like the slider")
+    parser.add_argument("--workers", type=int, help="processes to use, default one per CPU")
+    parser.add_argument("--chunk-frames", type=int, default=240,
+                        help="frames each worker filters at a time")
+    parser.add_argument("--codec", help="fourcc of the output, e.g. mp4v, MJPG, FFV1")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore finished chunks from an earlier run")
+    parser.add_argument("--keep-parts", action="store_true",
+                        help="keep the filtered chunks after joining them")
+    args = parser.parse_args()
+
+    if not args.filter:
+        parser.error("give at least one --filter")
+    values = slider_values(args.threshold, tuple(args.canny), args.blur, args.hue,
+                           args.enhance)
+    summary = process_video(args.input, args.output, args.filter, values, args.workers,
+                            args.chunk_frames, args.codec, args.restart, args.keep_parts,
+                            progress=print_progress)
+    print(file=sys.stderr)
+    print(f"{summary['frames']} frames filtered in {summary['seconds']:.1f}s "
+          f"({summary['fps']:.1f} fps), {summary['skipped_chunks']} chunks already done",
+          file=sys.stderr)
+    if summary["output"] is None:
+        sys.exit(f"{summary['failed_chunks']} chunks failed, run again to retry them")
+    print(f"{summary['written']} frames written to {summary['output']} in "
+          f"{summary['total_seconds']:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# image_loader.py
+
+"""
+Decode and scale images away from the GUI thread
+
+    loader = ImageLoader(post=wx.CallAfter)
+    loader.submit(scaled_image, self.show_image, path, 400)
+
+The work runs in a background thread and show_image(result, error) is
+called on the GUI thread through post. Only the latest request counts:
+a request that hasn't started yet is dropped when a new one comes in,
+and the result of one that was already running is thrown away.
+
+The same file is in "Intro to PySimpleGUI/PySimpleGUI vs wxPython" and
+in "Python GUI Frameworks", so that each talk's folder runs on its own.
+test_image_loader.py fails if the two copies differ.
+"""
+
+import threading
+
+from PIL import Image, ImageOps
+
+
+def scaled_image(path, max_size):
+    """
+    Decode an image as RGB, scaled so its longest side is max_size
+
+    The JPEG decoder is asked for a reduced size first, which skips
+    most of the work for large photos. Smaller images are scaled up,
+    as the viewers always did.
+    """
+    with Image.open(path) as image:
+        image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size))
+    else:
+        scale = max_size / max(image.size)
+        image = image.resize((max(1, int(image.width * scale)),
+                              max(1, int(image.height * scale))))
+    return image
+
+
+class ImageLoader:
+
+    def __init__(self, post):
+        self.post = post
+        self.generation = 0
+        self.job = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, work, done, *args):
+        """
+        Run work(*args) in the background, then done(result, error)
+        """
+        with self.condition:
+            self.generation += 1
+            self.job = (self.generation, work, args, done)
+            self.condition.notify()
+
+    def cancel(self):
+        with self.condition:
+            self.generation += 1
+            self.job = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.job is None:
+                    self.condition.wait()
+                generation, work, args, done = self.job
+                self.job = None
+            if generation != self.generation:
+                continue
+            try:
+                result, error = work(*args), None
+            except Exception as exc:
+                # Reported to the GUI instead of ending the thread
+                result, error = None, exc
+            self.post(self.deliver, generation, done, result, error)
+
+    def deliver(self, generation, done, result, error):
+        # Runs on the GUI thread
+        if generation == self.generation:
+            done(result, error)
@@ -2,10 +2,14 @@
 
 import wx
 
+from image_loader import ImageLoader, scaled_image
+
 class ImagePanel(wx.Panel):
     def __init__(self, parent):
         super().__init__(parent)
-        img = wx.Image(400, 400)
+        self.max_size = 400
+        self.loader = ImageLoader(post=wx.CallAfter)
+        img = wx.Image(self.max_size, self.max_size)
         self.image_ctrl = wx.StaticBitmap(self, bitmap=wx.Bitmap(img))
         
         browse_btn = wx.Button(self, label="Browse")
@@ -27,17 +31,13 @@ class ImagePanel(wx.Panel):
                 self.load_image(dialog.GetPath())
                 
     def load_image(self, image_path):
-        img = wx.Image(image_path, wx.BITMAP_TYPE_ANY)
-        self.max_size = 400
-        W = img.GetWidth()
-        H = img.GetHeight()
-        if W > H:
-            new_w = self.max_size
-            new_h = self.max_size * H / W
-        else:
-            new_h = self.max_size
-            new_w = self.max_size * W / H
-        img = img.Scale(int(new_w), int(new_h))
+        self.loader.submit(scaled_image, self.show_image, image_path, self.max_size)
+
+    def show_image(self, image, error):
+        if error is not None:
+            wx.MessageBox(str(error), "Could not open image", wx.ICON_ERROR)
+            return
+        img = wx.Image(image.width, image.height, image.tobytes())
         self.image_ctrl.SetBitmap(wx.Bitmap(img))
         self.Refresh()
 
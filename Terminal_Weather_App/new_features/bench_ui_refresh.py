@@ -0,0 +1,69 @@
+# bench_ui_refresh.py
+
+"""
+Mount N Weather widgets in a headless app and time refreshing them
+on the main thread
+
+    python bench_ui_refresh.py 100 500
+"""
+
+import asyncio
+import sys
+import time
+
+from geocoding import Location
+from stub_server import fake_forecast
+from weather_app import Weather, WeatherApp
+
+
+class BenchApp(WeatherApp):
+
+    # Only the UI is being measured, so nothing is looked up or fetched
+    def load_postal_codes(self):
+        pass
+
+    def schedule_weather(self, widget, fetch_now=True):
+        pass
+
+
+def refresh(widgets, forecasts):
+    start = time.perf_counter()
+    for widget, (location, weather_data) in zip(widgets, forecasts):
+        widget.update_ui(location, weather_data)
+    return time.perf_counter() - start
+
+
+async def bench(count):
+    app = BenchApp(cache_path=None, state_path=None)
+    async with app.run_test(size=(120, 40)) as pilot:
+        widgets = [Weather(f"{index:05d}", "us", "fahrenheit") for index in range(count)]
+        start = time.perf_counter()
+        await app.query_one("#vertical_scroll").mount_all(widgets)
+        await pilot.pause()
+        mount_time = time.perf_counter() - start
+
+        forecasts = [(Location(f"Town {index}", "ST", 30.0 + index % 20, -90.0),
+                      fake_forecast(30.0 + index % 20, -90.0, "fahrenheit"))
+                     for index in range(count)]
+        first = refresh(widgets, forecasts)
+        unchanged = refresh(widgets, forecasts)
+
+        # A new current temperature changes one label per widget
+        for _, weather_data in forecasts:
+            weather_data["current"]["temperature_2m"] += 1
+        one_label = refresh(widgets, forecasts)
+        await pilot.pause()
+
+    print(f"{count} widgets: mount {mount_time * 1000:.0f} ms, "
+          f"first refresh {first * 1000:.1f} ms, "
+          f"unchanged {unchanged * 1000:.1f} ms, "
+          f"one label changed {one_label * 1000:.1f} ms")
+
+
+def main():
+    for count in [int(arg) for arg in sys.argv[1:]] or [100, 500]:
+        asyncio.run(bench(count))
+
+
+if __name__ == "__main__":
+    main()
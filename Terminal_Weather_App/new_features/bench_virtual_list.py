@@ -0,0 +1,90 @@
+# bench_virtual_list.py
+
+"""
+Compare mount time and memory of the regular and the virtual list
+
+Each run happens in its own process so the peak RSS belongs to it alone.
+Mounting 10,000 regular widgets takes a very long time, so that one is
+skipped unless you ask for it with --all
+
+    python bench_virtual_list.py
+    python bench_virtual_list.py --all
+"""
+
+import argparse
+import asyncio
+import resource
+import subprocess
+import sys
+import time
+
+from geocoding import Location
+from stub_server import fake_forecast
+from weather_app import Weather, WeatherApp, forecast_state
+
+COUNTS = [100, 1_000, 10_000]
+
+
+class BenchApp(WeatherApp):
+
+    # Only the UI is being measured, so nothing is looked up or fetched
+    def load_postal_codes(self):
+        pass
+
+    def schedule_weather(self, widget, fetch_now=True):
+        pass
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def mount(count, virtual):
+    app = BenchApp(cache_path=None, state_path=None, virtual=virtual)
+    states = [forecast_state(Location(f"Town {index}", "ST", 30.0, -90.0),
+                             fake_forecast(30.0 + index % 20, -90.0, "fahrenheit"),
+                             "fahrenheit")
+              for index in range(count)]
+    async with app.run_test(size=(120, 40)) as pilot:
+        start = time.perf_counter()
+        scroll = app.query_one("#vertical_scroll")
+        if virtual:
+            for index, state in enumerate(states):
+                app.store.append(f"{index:05d}", "us", "fahrenheit", state)
+            scroll.update_window()
+        else:
+            await scroll.mount_all([Weather(f"{index:05d}", "us", "fahrenheit", state)
+                                    for index, state in enumerate(states)])
+        # Wait for the layout and the first paint
+        await pilot.pause()
+        elapsed = time.perf_counter() - start
+
+        widgets = len(app.query("*"))
+    mode = "virtual" if virtual else "regular"
+    print(f"{mode:8} {count:6} locations: mount {elapsed * 1000:8.0f} ms, "
+          f"{widgets:6} widgets, peak RSS {peak_rss_mb():6.0f} MB", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--all", action="store_true",
+                        help="also mount 10,000 regular widgets")
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "COUNT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        mode, count = args.run
+        asyncio.run(mount(int(count), mode == "virtual"))
+        return
+
+    for count in COUNTS:
+        for mode in ["regular", "virtual"]:
+            if mode == "regular" and count > 1_000 and not args.all:
+                continue
+            subprocess.run([sys.executable, __file__, "--run", mode, str(count)], check=True)
+
+
+if __name__ == "__main__":
+    main()
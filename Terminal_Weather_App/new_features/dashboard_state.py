@@ -0,0 +1,39 @@
+# dashboard_state.py
+
+import json
+import os
+
+from pathlib import Path
+
+from geocoding import CACHE_DIR
+
+STATE_PATH = CACHE_DIR / "dashboard.json"
+
+
+def save_dashboard(path, locations):
+    """
+    Save the dashboard's locations and their last forecast
+
+    locations is a list of dicts with postal_code, country, temp_unit
+    and state, the widget's last ForecastState or None
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as state_file:
+        json.dump({"version": 1, "locations": locations}, state_file)
+    os.replace(tmp_path, path)
+
+
+def load_dashboard(path):
+    """
+    Return the saved locations, or an empty list if there aren't any
+    """
+    try:
+        with open(path, encoding="utf-8") as state_file:
+            saved = json.load(state_file)
+    except (OSError, ValueError):
+        return []
+    if saved.get("version") != 1:
+        return []
+    return saved.get("locations", [])
@@ -0,0 +1,153 @@
+# forecast.py
+
+import asyncio
+import os
+from urllib.parse import quote
+
+from forecast_cache import ForecastCache, cache_key
+from geocoding import PostalCodeResolver
+from http_client import ForecastClient
+
+# Point this at stub_server.py to try the app without hitting open-meteo
+FORECAST_URL = os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Keep the URL a reasonable length when many locations are batched together
+MAX_BATCH_SIZE = 100
+
+TIMEZONE = "America/Chicago"
+
+
+def build_forecast_url(coordinates, temp_unit, timezone=TIMEZONE):
+    """
+    Build one open-meteo URL for a list of (latitude, longitude) pairs
+    """
+    latitudes = ",".join(str(lat) for lat, _ in coordinates)
+    longitudes = ",".join(str(lon) for _, lon in coordinates)
+    return (f"{FORECAST_URL}?latitude={latitudes}&longitude={longitudes}&current=temperature_2m,"
+            f"precipitation,rain,weather_code&daily=weather_code,temperature_2m_max,temperature_2m_min"
+            f"&temperature_unit={temp_unit}&timezone={quote(timezone, safe='')}")
+
+
+async def fetch_forecasts(client, coordinates, temp_unit):
+    """
+    Fetch the forecasts for all the coordinates with a single request
+
+    Returns a list of weather dicts in the same order as the coordinates
+    or None if the request failed
+    """
+    weather_data = await client.get_json(build_forecast_url(coordinates, temp_unit))
+    if weather_data is None:
+        return None
+
+    # open-meteo only returns a list when more than one location is requested
+    if isinstance(weather_data, dict):
+        weather_data = [weather_data]
+    return weather_data
+
+
+class ForecastScheduler:
+    """
+    Groups the registered Weather widgets into batched forecast requests
+    """
+
+    def __init__(self, resolver=None, client=None, cache=None, batch_size=MAX_BATCH_SIZE):
+        self.resolver = resolver or PostalCodeResolver()
+        self.client = client or ForecastClient()
+        self.cache = cache or ForecastCache()
+        self.batch_size = batch_size
+        self.widgets = []
+        self.request_count = 0
+
+    def register(self, widget):
+        self.widgets.append(widget)
+
+    def unregister(self, widget):
+        if widget in self.widgets:
+            self.widgets.remove(widget)
+
+    def batches(self, keys):
+        """
+        Split the cache keys into batches that can share one request
+
+        The temperature unit is a query parameter, so only keys with
+        the same unit can go in the same batch. Sorting keeps the same
+        locations in the same request, so its ETag can be reused.
+        """
+        by_unit = {}
+        for key in sorted(keys):
+            by_unit.setdefault(key[2], []).append(key)
+
+        for unit_keys in by_unit.values():
+            for start in range(0, len(unit_keys), self.batch_size):
+                yield unit_keys[start:start + self.batch_size]
+
+    def locate(self, widgets):
+        """
+        Look up the location of each widget
+
+        Widgets whose postal code can't be found are left out
+        """
+        located = []
+        for widget in widgets:
+            location = self.resolver.resolve(widget.country, widget.postal_code)
+            if location is not None:
+                located.append((widget, location))
+        return located
+
+    async def fetch(self, keys, forecasts):
+        """
+        Fetch the forecasts for one batch of cache keys into forecasts
+        """
+        temp_unit = keys[0][2]
+        url = build_forecast_url([(key[0], key[1]) for key in keys], temp_unit)
+        self.request_count += 1
+        response = await self.client.get(url, headers=self.cache.conditional_headers(url, keys))
+        if response is None:
+            return
+
+        if response.status_code == 304:
+            weather_data = self.cache.revalidate(keys, response.headers)
+        elif response.status_code == 200:
+            weather_data = response.json()
+            # open-meteo only returns a list when more than one location is requested
+            if isinstance(weather_data, dict):
+                weather_data = [weather_data]
+            self.cache.store_response(url, keys, weather_data, response.headers)
+        else:
+            return
+        if weather_data is not None:
+            forecasts.update(zip(keys, weather_data))
+
+    async def fetch_all(self, widgets=None, located=None):
+        """
+        Fetch the forecasts for the widgets, all the batches concurrently
+
+        Pass located, the (widget, location) pairs from locate(), instead
+        of widgets when the locations have already been looked up.
+        Returns a list of (widget, location, weather_data) tuples
+        """
+        if located is None:
+            widgets = list(widgets if widgets is not None else self.widgets)
+            # Loading a country's postal codes the first time can take a while
+            located = await asyncio.to_thread(self.locate, widgets)
+
+        # Widgets in the same grid cell share one forecast
+        by_key = {}
+        for widget, location in located:
+            key = cache_key(location.latitude, location.longitude, widget.temp_unit, TIMEZONE)
+            by_key.setdefault(key, []).append((widget, location))
+
+        forecasts = {}
+        missing = []
+        for key in by_key:
+            weather_data = self.cache.get(key)
+            if weather_data is None:
+                missing.append(key)
+            else:
+                forecasts[key] = weather_data
+
+        await asyncio.gather(*(self.fetch(keys, forecasts) for keys in self.batches(missing)))
+
+        return [(widget, location, forecasts[key])
+                for key, group in by_key.items() if key in forecasts
+                for widget, location in group]
@@ -0,0 +1,136 @@
+# forecast_cache.py
+
+import json
+import os
+import re
+import threading
+import time
+
+from pathlib import Path
+
+# Two decimal places is roughly a kilometer, finer than the forecast grid
+PRECISION = 2
+
+
+def cache_key(latitude, longitude, temp_unit, timezone, precision=PRECISION):
+    return (round(latitude, precision), round(longitude, precision), temp_unit, timezone)
+
+
+def max_age(headers, default):
+    """
+    Get the lifetime of a response from its Cache-Control header
+    """
+    match = re.search(r"max-age=(\d+)", headers.get("Cache-Control", ""))
+    return int(match.group(1)) if match else default
+
+
+class ForecastCache:
+    """
+    Forecasts keyed by rounded coordinates, temperature unit and timezone
+
+    Fresh entries are served without a request. Once they expire, the
+    ETag / Last-Modified of the request that fetched them is used to
+    ask open-meteo whether anything changed.
+    """
+
+    def __init__(self, ttl=3600, path=None, max_entries=None):
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.entries = {}
+        self.validators = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.lock = threading.Lock()
+        if self.path:
+            self.load()
+
+    def get(self, key):
+        """
+        Return the forecast if it is still fresh, otherwise None
+        """
+        entry = self.entries.get(key)
+        if entry is not None and entry["expires"] > time.time():
+            self.hits += 1
+            return entry["data"]
+        self.misses += 1
+        return None
+
+    def put(self, key, data, lifetime=None):
+        self.entries.pop(key, None)
+        self.entries[key] = {"data": data,
+                             "expires": time.time() + (self.ttl if lifetime is None else lifetime)}
+        self.trim(self.entries)
+
+    def trim(self, cache):
+        # Dicts keep insertion order, so the first items are the oldest
+        while self.max_entries and len(cache) > self.max_entries:
+            del cache[next(iter(cache))]
+
+    def conditional_headers(self, url, keys):
+        """
+        Headers for revalidating the entries that a previous request to url filled
+        """
+        validator = self.validators.get(url)
+        if validator is None or any(key not in self.entries for key in keys):
+            return {}
+        headers = {}
+        if validator.get("etag"):
+            headers["If-None-Match"] = validator["etag"]
+        if validator.get("last_modified"):
+            headers["If-Modified-Since"] = validator["last_modified"]
+        return headers
+
+    def store_response(self, url, keys, forecasts, headers):
+        lifetime = max_age(headers, self.ttl)
+        for key, data in zip(keys, forecasts):
+            self.put(key, data, lifetime)
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag or last_modified:
+            self.validators.pop(url, None)
+            self.validators[url] = {"etag": etag, "last_modified": last_modified}
+            self.trim(self.validators)
+
+    def revalidate(self, keys, headers):
+        """
+        The server said nothing changed, so the entries are good for another lifetime
+
+        Returns None if some of the entries were evicted in the meantime
+        """
+        if any(key not in self.entries for key in keys):
+            return None
+        lifetime = max_age(headers, self.ttl)
+        self.revalidated += len(keys)
+        for key in keys:
+            self.entries[key]["expires"] = time.time() + lifetime
+        return [self.entries[key]["data"] for key in keys]
+
+    def stats(self):
+        return f"cache: {self.hits} hits / {self.misses} misses / {self.revalidated} revalidated"
+
+    def load(self):
+        try:
+            with open(self.path) as cache_file:
+                saved = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        # JSON has no tuples, so the keys are stored as lists
+        self.entries = {tuple(key): entry for key, entry in saved.get("entries", [])}
+        self.validators = saved.get("validators", {})
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            now = time.time()
+            # Expired entries are still useful for revalidation, but not forever
+            entries = [[list(key), entry] for key, entry in list(self.entries.items())
+                       if entry["expires"] > now - 7 * 24 * 3600]
+            validators = dict(self.validators)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as cache_file:
+                json.dump({"entries": entries, "validators": validators}, cache_file)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,209 @@
+# forecast_table.py
+
+import numpy as np
+
+from textual import on
+from textual.app import ComposeResult
+from textual.containers import Horizontal
+from textual.screen import Screen
+from textual.widgets import DataTable, Footer, Header, Input, Select
+
+# Today plus the next three days
+DAYS = 4
+
+SORT_OPTIONS = [("Low", "low"), ("High", "high"), ("Current", "current"), ("Place", "place")]
+DAY_OPTIONS = [("Today", 0), ("Tomorrow", 1), ("Day +2", 2), ("Day +3", 3)]
+ORDER_OPTIONS = [("Ascending", "asc"), ("Descending", "desc")]
+
+
+def _matrix(rows, dtype):
+    """
+    Turn a list of equal length lists into an array, treating null as missing
+    """
+    try:
+        return np.array(rows, dtype=dtype)
+    except (TypeError, ValueError):
+        missing = "NaT" if np.dtype(dtype).kind == "M" else np.nan
+        return np.array([[missing if value is None else value for value in row]
+                         for row in rows], dtype=dtype)
+
+
+class ForecastColumns:
+    """
+    The forecasts of every location, one NumPy array per variable
+
+    Each location gets a row the first time its forecast is ingested.
+    The weather codes are decoded with a lookup table indexed by code.
+    """
+
+    def __init__(self, wmo_codes, capacity=1024):
+        self.lut = np.array([wmo_codes.get(code, "Unknown") for code in range(100)],
+                            dtype=object)
+        self.size = 0
+        self.rows = {}
+        self.place = np.empty(capacity, dtype=object)
+        self.fahrenheit = np.zeros(capacity, dtype=bool)
+        self.current = np.full(capacity, np.nan, dtype=np.float32)
+        self.low = np.full((capacity, DAYS), np.nan, dtype=np.float32)
+        self.high = np.full((capacity, DAYS), np.nan, dtype=np.float32)
+        self.code = np.zeros((capacity, DAYS), dtype=np.int16)
+        self.time = np.full((capacity, DAYS), np.datetime64("NaT"), dtype="datetime64[D]")
+        self.lower_place = None
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, needed):
+        capacity = len(self.place)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ["place", "fahrenheit", "current", "low", "high", "code", "time"]:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def row_of(self, item):
+        row = self.rows.get(item)
+        if row is None:
+            row = self.rows[item] = self.size
+            self.size += 1
+            self._grow(self.size)
+        return row
+
+    def ingest(self, results):
+        """
+        Store a batch of (item, location, weather_data) tuples in one go
+        """
+        if not results:
+            return
+        rows = np.array([self.row_of(item) for item, _, _ in results])
+        daily = [weather_data["daily"] for _, _, weather_data in results]
+
+        self.place[rows] = [f"{location.place_name}, {location.state_code}"
+                            for _, location, _ in results]
+        self.fahrenheit[rows] = [item.temp_unit == "fahrenheit" for item, _, _ in results]
+        self.current[rows] = _matrix([[weather_data["current"]["temperature_2m"]]
+                                      for _, _, weather_data in results], np.float32)[:, 0]
+        self.low[rows] = _matrix([day["temperature_2m_min"][:DAYS] for day in daily], np.float32)
+        self.high[rows] = _matrix([day["temperature_2m_max"][:DAYS] for day in daily], np.float32)
+        codes = _matrix([day["weather_code"][:DAYS] for day in daily], np.float32)
+        self.code[rows] = np.nan_to_num(codes, nan=-1)
+        self.time[rows] = _matrix([day["time"][:DAYS] for day in daily], "datetime64[D]")
+        self.lower_place = None
+
+    def describe(self, codes):
+        """
+        Decode an array of WMO codes in one lookup
+        """
+        codes = np.asarray(codes)
+        known = (codes >= 0) & (codes < len(self.lut))
+        return np.where(known, self.lut[np.clip(codes, 0, len(self.lut) - 1)], "Unknown")
+
+    def celsius(self, values):
+        # Locations can use either unit, so compare everything in Celsius
+        fahrenheit = self.fahrenheit[:self.size]
+        if values.ndim == 2:
+            fahrenheit = fahrenheit[:, None]
+        return np.where(fahrenheit, (values - 32) * 5 / 9, values)
+
+    def query(self, day=1, sort_by="low", descending=False, text="", limit=50):
+        """
+        Return the rows matching text, sorted, at most limit of them
+
+        For example the 20 coldest locations tomorrow:
+
+            columns.query(day=1, sort_by="low", limit=20)
+        """
+        size = self.size
+        if text:
+            if self.lower_place is None:
+                self.lower_place = np.char.lower(self.place[:size].astype(str))
+            candidates = np.flatnonzero(np.char.find(self.lower_place, text.lower()) >= 0)
+        else:
+            candidates = np.arange(size)
+
+        if sort_by == "place":
+            order = np.argsort(self.place[candidates], kind="stable")
+            if descending:
+                order = order[::-1]
+            return candidates[order[:limit]]
+
+        if sort_by == "current":
+            key = self.celsius(self.current[:size])[candidates]
+        else:
+            column = self.low if sort_by == "low" else self.high
+            key = self.celsius(column[:size, day])[candidates]
+        if descending:
+            key = -key
+
+        # Missing values sort last either way
+        key = np.where(np.isnan(key), np.inf, key)
+        if limit < len(key):
+            top = np.argpartition(key, limit)[:limit]
+            order = top[np.argsort(key[top], kind="stable")]
+        else:
+            order = np.argsort(key, kind="stable")
+        return candidates[order]
+
+    def table_rows(self, rows, day):
+        """
+        The values to show for each row, decoded for the whole selection at once
+        """
+        units = np.where(self.fahrenheit[rows], "F", "C")
+        descriptions = self.describe(self.code[rows, day])
+        return [
+            (self.place[row], f"{self.current[row]:.1f} {unit}", str(self.time[row, day]),
+             f"{self.low[row, day]:.1f} {unit}", f"{self.high[row, day]:.1f} {unit}",
+             description)
+            for row, unit, description in zip(rows, units, descriptions)
+        ]
+
+
+class ForecastTableScreen(Screen):
+    """
+    A sortable, filterable table of the forecasts of every location
+    """
+
+    BINDINGS = [("escape", "app.pop_screen", "Back")]
+
+    def __init__(self, columns: ForecastColumns) -> None:
+        super().__init__()
+        self.columns = columns
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        yield Horizontal(
+            Input(placeholder="Filter by place", id="filter"),
+            Select(SORT_OPTIONS, value="low", id="sort_by", allow_blank=False),
+            Select(DAY_OPTIONS, value=1, id="day", allow_blank=False),
+            Select(ORDER_OPTIONS, value="asc", id="order", allow_blank=False),
+            Input(value="50", placeholder="Rows", id="limit", type="integer"),
+            id="table_controls",
+        )
+        yield DataTable(id="forecast_table", cursor_type="row")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        table = self.query_one(DataTable)
+        table.add_columns("Place", "Current", "Day", "Low", "High", "Weather")
+        self.update_table()
+
+    @on(Input.Changed)
+    @on(Select.Changed)
+    def update_table(self) -> None:
+        limit = self.query_one("#limit", Input).value
+        day = self.query_one("#day", Select).value
+        rows = self.columns.query(
+            day=day,
+            sort_by=self.query_one("#sort_by", Select).value,
+            descending=self.query_one("#order", Select).value == "desc",
+            text=self.query_one("#filter", Input).value,
+            limit=int(limit) if limit.isdigit() else 50,
+        )
+        table = self.query_one(DataTable)
+        table.clear()
+        table.add_rows(self.columns.table_rows(rows, day))
+        self.sub_title = f"{len(rows)} of {len(self.columns)} locations"
@@ -0,0 +1,140 @@
+# geocoding.py
+
+import math
+import mmap
+import os
+import struct
+import threading
+
+from collections import namedtuple
+from pathlib import Path
+
+import pgeocode
+
+Location = namedtuple("Location", ["place_name", "state_code", "latitude", "longitude"])
+
+CACHE_DIR = Path(os.environ.get("WEATHER_APP_CACHE",
+                                Path.home() / ".cache" / "weather_app"))
+
+# Every postal code is stored as one fixed-size record, so a record can be
+# read straight out of the memory map without parsing the rest of the file
+MAGIC = b"PCIDX001"
+HEADER = struct.Struct("<8sI")
+RECORD = struct.Struct("<20s80s8sdd")
+KEY_SIZE = 20
+
+
+def normalize_postal_code(postal_code):
+    return str(postal_code).strip().upper()
+
+
+def _encode(text, size):
+    """
+    Encode text to UTF-8 without splitting a character at the size limit
+    """
+    data = text.encode("utf-8")[:size]
+    return data.decode("utf-8", errors="ignore").encode("utf-8")
+
+
+def _text(value):
+    # pandas uses NaN for missing values
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    return str(value)
+
+
+def build_index_file(country, path):
+    """
+    Write the postal code table of a country to an index file
+
+    This is the only place that touches pgeocode and pandas
+    """
+    # pgeocode has no public way to get a whole country's table, so this
+    # reads its private _data_frame. requirements.tct pins the version it
+    # was checked against; check this line again before upgrading.
+    data = pgeocode.Nominatim(country)._data_frame
+    records = []
+    for row in data.itertuples(index=False):
+        if math.isnan(row.latitude) or math.isnan(row.longitude):
+            continue
+        records.append(RECORD.pack(
+            _encode(normalize_postal_code(row.postal_code), KEY_SIZE),
+            _encode(_text(row.place_name), 80),
+            _encode(_text(row.state_code), 8),
+            row.latitude,
+            row.longitude,
+        ))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as index_file:
+        index_file.write(HEADER.pack(MAGIC, len(records)))
+        index_file.writelines(records)
+    # Another process never sees a half written index
+    os.replace(tmp_path, path)
+
+
+class CountryIndex:
+    """
+    Memory-mapped postal code records with an in-memory hash index
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as index_file:
+            self.map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or len(self.map) != HEADER.size + count * RECORD.size:
+            self.map.close()
+            raise ValueError(f"{path} is not a valid postal code index")
+
+        # Only the keys are read up front, the rest stays on disk until needed
+        self.offsets = {}
+        for number in range(count):
+            offset = HEADER.size + number * RECORD.size
+            key = self.map[offset:offset + KEY_SIZE].rstrip(b"\0")
+            self.offsets[key.decode("utf-8")] = offset
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, postal_code):
+        offset = self.offsets.get(normalize_postal_code(postal_code))
+        if offset is None:
+            return None
+        _, place_name, state_code, lat, lon = RECORD.unpack_from(self.map, offset)
+        return Location(place_name.rstrip(b"\0").decode("utf-8"),
+                        state_code.rstrip(b"\0").decode("utf-8"),
+                        lat, lon)
+
+
+class PostalCodeResolver:
+    """
+    Look up postal codes for any number of countries
+
+    Each country's table is loaded at most once per process and cached
+    on disk, so restarting the app doesn't re-parse anything
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def load(self, country):
+        country = country.lower()
+        with self.lock:
+            if country not in self.indexes:
+                path = self.cache_dir / f"postal_codes_{country}.idx"
+                try:
+                    self.indexes[country] = CountryIndex(path)
+                except (OSError, ValueError):
+                    build_index_file(country, path)
+                    self.indexes[country] = CountryIndex(path)
+            return self.indexes[country]
+
+    def resolve(self, country, postal_code):
+        """
+        Return the Location of the postal code or None if it is unknown
+        """
+        return self.load(country).get(postal_code)
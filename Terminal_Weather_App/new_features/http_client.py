@@ -0,0 +1,72 @@
+# http_client.py
+
+import asyncio
+import random
+
+import httpx
+
+# Worth another try, anything else won't get better by asking again
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ForecastClient:
+    """
+    A pooled, keep-alive HTTP client for fetching forecasts on one event loop
+    """
+
+    def __init__(self, max_concurrency=8, timeout=10.0, retries=3, backoff=0.5):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.client = None
+        self.semaphore = None
+
+    async def start(self):
+        # The client and semaphore belong to the running event loop
+        if self.client is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency,
+                                  max_keepalive_connections=self.max_concurrency)
+            self.client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def get(self, url, headers=None):
+        """
+        GET the url, retrying with exponential backoff
+
+        Returns the last response or None if the server could not be reached
+        """
+        await self.start()
+        async with self.semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self.client.get(url, headers=headers)
+                except httpx.TransportError:
+                    # Connection problems and timeouts
+                    response = None
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        return response
+
+                if attempt < self.retries:
+                    delay = self.backoff * 2 ** attempt
+                    await asyncio.sleep(delay + random.uniform(0, delay))
+            return response
+
+    async def get_json(self, url):
+        response = await self.get(url)
+        if response is None or response.status_code != 200:
+            return None
+        return response.json()
@@ -0,0 +1,83 @@
+# location_store.py
+
+
+class LocationStore:
+    """
+    Column-per-field storage for the locations of the virtual list
+
+    Only the rows on screen have widgets. Everything else lives here,
+    one list per field instead of a dozen widgets per location.
+    """
+
+    def __init__(self):
+        self.postal_codes = []
+        self.countries = []
+        self.temp_units = []
+        self.states = []
+        self.rows = []
+        # Row index -> the widget currently showing that row
+        self.bound = {}
+
+    def __len__(self):
+        return len(self.postal_codes)
+
+    def append(self, postal_code, country, temp_unit, state=None):
+        self.postal_codes.append(postal_code)
+        self.countries.append(country)
+        self.temp_units.append(temp_unit)
+        self.states.append(state)
+        row = LocationRow(self, len(self.rows))
+        self.rows.append(row)
+        return row
+
+    def set_state(self, index, state):
+        """
+        Store a new forecast for a row and show it if the row is on screen
+
+        Returns whether anything changed
+        """
+        if self.states[index] == state:
+            return False
+        self.states[index] = state
+        widget = self.bound.get(index)
+        if widget is not None:
+            widget.show_state(state)
+        return True
+
+
+class LocationRow:
+    """
+    A lightweight handle to one row of a LocationStore
+
+    It has the same attributes as a Weather widget, so the forecast and
+    refresh schedulers can use it in place of one
+    """
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def postal_code(self):
+        return self.store.postal_codes[self.index]
+
+    @property
+    def country(self):
+        return self.store.countries[self.index]
+
+    @property
+    def temp_unit(self):
+        return self.store.temp_units[self.index]
+
+    @property
+    def state(self):
+        return self.store.states[self.index]
+
+    @property
+    def is_attached(self):
+        return True
+
+    def show_state(self, state):
+        return self.store.set_state(self.index, state)
@@ -0,0 +1,94 @@
+# refresh_scheduler.py
+
+import math
+import random
+import time
+
+
+class RefreshScheduler:
+    """
+    Decides when each item is due for a refresh
+
+    New items are spread across the interval so they don't all refresh
+    at the same moment. Items whose data didn't change are backed off,
+    up to max_backoff times the interval. While the app is idle every
+    interval is stretched by idle_factor.
+    """
+
+    def __init__(self, interval=3600, jitter=0.1, max_backoff=4, idle_factor=2,
+                 clock=time.monotonic):
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.idle_factor = idle_factor
+        self.clock = clock
+        self.idle = False
+        self.entries = {}
+
+    def add(self, item):
+        """
+        Schedule the first periodic refresh of a new item
+
+        The first refresh happens somewhere between half and one and a
+        half intervals from now, after that the refreshes stay spread out
+        """
+        next_run = self.clock() + self.interval * random.uniform(0.5, 1.5)
+        self.entries[item] = {"next_run": next_run, "backoff": 1}
+
+    def remove(self, item):
+        self.entries.pop(item, None)
+
+    def due(self, is_visible=None):
+        """
+        Return the items that are due and visible, and mark them in flight
+
+        Due items that aren't visible wait until they are
+        """
+        now = self.clock()
+        ready = []
+        for item, entry in self.entries.items():
+            if entry["next_run"] > now:
+                continue
+            if is_visible is not None and not is_visible(item):
+                continue
+            # Nothing else is due until the refresh reports back through done()
+            entry["next_run"] = math.inf
+            ready.append(item)
+        return ready
+
+    def done(self, item, changed=True):
+        """
+        Schedule the next refresh, backing off if nothing changed
+
+        Only refreshes handed out by due() count, so fetching a new
+        item right away doesn't undo the spread from add()
+        """
+        entry = self.entries.get(item)
+        if entry is None or entry["next_run"] != math.inf:
+            return
+        if changed:
+            entry["backoff"] = 1
+        else:
+            entry["backoff"] = min(entry["backoff"] * 2, self.max_backoff)
+
+        interval = self.interval * entry["backoff"]
+        if self.idle:
+            interval *= self.idle_factor
+        entry["next_run"] = self.clock() + interval * random.uniform(
+            1 - self.jitter, 1 + self.jitter)
+
+    def queue_depth(self):
+        """
+        The number of items waiting to be refreshed, including hidden ones
+        """
+        now = self.clock()
+        return sum(1 for entry in self.entries.values() if entry["next_run"] <= now)
+
+    def next_runs(self):
+        """
+        Return (item, seconds until its next refresh, backoff) sorted by time
+        """
+        now = self.clock()
+        runs = [(item, max(entry["next_run"] - now, 0), entry["backoff"])
+                for item, entry in self.entries.items()]
+        return sorted(runs, key=lambda run: run[1])
@@ -0,0 +1,177 @@
+# stub_server.py
+
+"""
+A tiny stand-in for the open-meteo forecast API
+
+Run it on its own and point the app at it:
+
+    python stub_server.py --port 8080
+    OPEN_METEO_URL=http://127.0.0.1:8080/v1/forecast python weather_app.py
+
+Or measure one-request-per-location against batched requests offline:
+
+    python stub_server.py --bench 500
+"""
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_forecast(latitude, longitude, temp_unit):
+    """
+    Build a forecast shaped like the open-meteo response for one location
+    """
+    today = datetime.date.today()
+    base = 20 if temp_unit == "celsius" else 68
+    offset = int(abs(latitude + longitude)) % 10
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "current": {
+            "temperature_2m": base + offset,
+            "precipitation": 0.0,
+            "rain": 0.0,
+            "weather_code": 0,
+        },
+        "daily": {
+            "time": [str(today + datetime.timedelta(days=day)) for day in range(7)],
+            "weather_code": [(offset + day) % 4 for day in range(7)],
+            "temperature_2m_max": [base + offset + day for day in range(7)],
+            "temperature_2m_min": [base + offset - 10 + day for day in range(7)],
+        },
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self.send_json(self.server.stats)
+            return
+
+        query = parse_qs(url.query)
+        latitudes = [float(lat) for lat in query["latitude"][0].split(",")]
+        longitudes = [float(lon) for lon in query["longitude"][0].split(",")]
+        temp_unit = query.get("temperature_unit", ["celsius"])[0]
+
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+            self.server.stats["locations"] += len(latitudes)
+
+        # Pretend to be a server on the other side of the internet
+        time.sleep(self.server.delay)
+
+        forecasts = [fake_forecast(lat, lon, temp_unit)
+                     for lat, lon in zip(latitudes, longitudes)]
+        self.send_json(forecasts[0] if len(forecasts) == 1 else forecasts, cache=True)
+
+    def send_json(self, data, cache=False):
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if cache and self.headers.get("If-None-Match") == etag:
+            with self.server.lock:
+                self.server.stats["not_modified"] += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if cache:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the terminal quiet
+        pass
+
+
+def start_stub_server(port=0, delay=0.05):
+    """
+    Start the stub server in a background thread and return it
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.delay = delay
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0, "locations": 0, "not_modified": 0}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+async def bench(count, delay):
+    server = start_stub_server(delay=delay)
+    host, port = server.server_address
+
+    # forecast reads the URL when it is imported
+    os.environ["OPEN_METEO_URL"] = f"http://{host}:{port}/v1/forecast"
+    from forecast import MAX_BATCH_SIZE, fetch_forecasts
+    from http_client import ForecastClient
+
+    coordinates = [(30 + i % 20, -90 - i % 30) for i in range(count)]
+
+    async with ForecastClient() as client:
+        start = time.perf_counter()
+        for coordinate in coordinates:
+            await fetch_forecasts(client, [coordinate], "fahrenheit")
+        sequential = time.perf_counter() - start
+        sequential_requests = server.stats["requests"]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch_forecasts(client, [coordinate], "fahrenheit")
+                               for coordinate in coordinates))
+        pooled = time.perf_counter() - start
+        pooled_requests = server.stats["requests"] - sequential_requests
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch_forecasts(client, coordinates[index:index + MAX_BATCH_SIZE],
+                                               "fahrenheit")
+                               for index in range(0, count, MAX_BATCH_SIZE)))
+        batched = time.perf_counter() - start
+        batched_requests = server.stats["requests"] - sequential_requests - pooled_requests
+
+    print(f"{count} locations, {delay * 1000:.0f} ms simulated latency")
+    print(f"  one request per location:    {sequential_requests:5} requests, {sequential:.2f}s")
+    print(f"  concurrent, pooled requests: {pooled_requests:5} requests, {pooled:.2f}s")
+    print(f"  batched:                     {batched_requests:5} requests, {batched:.2f}s")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub open-meteo forecast server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--delay", type=float, default=0.05,
+                        help="seconds to wait before answering each request")
+    parser.add_argument("--bench", type=int, metavar="LOCATIONS",
+                        help="compare single and batched requests then exit")
+    args = parser.parse_args()
+
+    if args.bench:
+        asyncio.run(bench(args.bench, args.delay))
+        return
+
+    server = start_stub_server(args.port, args.delay)
+    print(f"Stub open-meteo running on http://127.0.0.1:{args.port}/v1/forecast")
+    print(f"Request counts at http://127.0.0.1:{args.port}/stats")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# test_weather_app.py
+
+import unittest
+from unittest import mock
+
+import forecast
+from geocoding import Location
+from stub_server import start_stub_server
+from weather_app import Weather, WeatherApp
+
+WIDGETS = 20
+
+
+class FakeResolver:
+    """
+    Every postal code is somewhere different, so no two widgets share a forecast
+    """
+
+    def load(self, country):
+        pass
+
+    def resolve(self, country, postal_code):
+        number = int(postal_code)
+        return Location(f"Place {number}", "IL", 30.0 + number, -90.0 - number)
+
+
+class TestForecastBatching(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = start_stub_server(delay=0)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address
+        patcher = mock.patch.object(forecast, "FORECAST_URL",
+                                    f"http://{host}:{port}/v1/forecast")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_mounted_widgets_share_one_request(self):
+        """
+        Widgets mounted together are fetched with one batched request
+        and every one of them is updated
+        """
+        app = WeatherApp(cache_path=None, state_path=None)
+        app.resolver = app.forecast_scheduler.resolver = FakeResolver()
+        async with app.run_test() as pilot:
+            widgets = [Weather(str(number), "us", "fahrenheit") for number in range(WIDGETS)]
+            await app.query_one("#vertical_scroll").mount_all(widgets)
+            # Mounted widgets are collected for 0.2 seconds before the fetch
+            await pilot.pause(0.5)
+            await app.workers.wait_for_complete()
+
+            self.assertEqual(self.server.stats["requests"], 1)
+            self.assertEqual(self.server.stats["locations"], WIDGETS)
+            self.assertEqual(app.forecast_scheduler.request_count, 1)
+            for number, widget in enumerate(widgets):
+                self.assertIsNotNone(widget.state)
+                self.assertEqual(widget.state.place_name, f"Place {number}")
+
+
+if __name__ == "__main__":
+    unittest.main()
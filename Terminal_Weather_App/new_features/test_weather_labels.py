@@ -0,0 +1,74 @@
+# test_weather_labels.py
+
+import copy
+import unittest
+from unittest import mock
+
+from textual.widgets import Label
+
+from geocoding import Location
+from stub_server import fake_forecast
+from weather_app import Weather, WeatherApp
+
+
+class QuietApp(WeatherApp):
+
+    # Nothing is looked up or fetched, the tests call update_ui themselves
+    def load_postal_codes(self):
+        pass
+
+    def schedule_weather(self, widget, fetch_now=True):
+        pass
+
+    def unschedule_weather(self, widget):
+        pass
+
+
+class TestWeatherRefresh(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.location = Location("Chicago", "IL", 41.9, -87.6)
+        self.weather_data = fake_forecast(41.9, -87.6, "fahrenheit")
+
+    async def mount_weather(self, app, pilot):
+        weather = Weather("60601", "us", "fahrenheit")
+        await app.query_one("#vertical_scroll").mount(weather)
+        await pilot.pause()
+        return weather
+
+    async def test_unchanged_state_does_not_touch_the_labels(self):
+        """
+        Refreshing with the same forecast updates no label at all
+        """
+        app = QuietApp(cache_path=None, state_path=None)
+        async with app.run_test() as pilot:
+            weather = await self.mount_weather(app, pilot)
+            self.assertTrue(weather.update_ui(self.location, self.weather_data))
+            labels = list(weather.query(Label))
+
+            with mock.patch.object(Label, "update") as update:
+                changed = weather.update_ui(self.location, copy.deepcopy(self.weather_data))
+            self.assertFalse(changed)
+            update.assert_not_called()
+            # The same label widgets are kept, nothing was remounted
+            self.assertEqual(list(weather.query(Label)), labels)
+
+    async def test_only_changed_labels_are_rewritten(self):
+        """
+        A new current temperature rewrites just that one label
+        """
+        app = QuietApp(cache_path=None, state_path=None)
+        async with app.run_test() as pilot:
+            weather = await self.mount_weather(app, pilot)
+            weather.update_ui(self.location, self.weather_data)
+
+            newer = copy.deepcopy(self.weather_data)
+            newer["current"]["temperature_2m"] += 1
+            with mock.patch.object(Label, "update") as update:
+                changed = weather.update_ui(self.location, newer)
+            self.assertTrue(changed)
+            self.assertEqual(update.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# virtual_list.py
+
+import math
+
+from textual.containers import VerticalScroll
+from textual.widget import Widget
+
+
+class VirtualList(VerticalScroll):
+    """
+    A scrolling list that only mounts widgets for the rows on screen
+
+    Spacers above and below the row widgets stand in for the rows that
+    are scrolled out of view. When the list scrolls, the same widgets are
+    bound to different rows instead of mounting new ones.
+
+    Every row must be exactly row_height lines tall, including its margin.
+    make_row() creates a row widget and bind_row(widget, index) points
+    it at another row of data.
+    """
+
+    def __init__(self, row_count, make_row, bind_row, row_height, buffer=2, **kwargs):
+        super().__init__(**kwargs)
+        self.row_count = row_count
+        self.make_row = make_row
+        self.bind_row = bind_row
+        self.row_height = row_height
+        self.buffer = buffer
+        self.top_spacer = Widget()
+        self.bottom_spacer = Widget()
+        self.pool = []
+        self.bound_rows = []
+        self.first_row = 0
+
+    def compose(self):
+        yield self.top_spacer
+        yield self.bottom_spacer
+
+    def on_mount(self) -> None:
+        for spacer in (self.top_spacer, self.bottom_spacer):
+            spacer.styles.height = 0
+
+    def on_resize(self) -> None:
+        self.update_window()
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        if int(old_value // self.row_height) != int(new_value // self.row_height):
+            self.update_window()
+
+    def update_window(self) -> None:
+        """
+        Bind the pooled widgets to the rows around the visible area
+        """
+        count = self.row_count()
+        on_screen = math.ceil(self.size.height / self.row_height) + 1
+        wanted = min(count, on_screen + 2 * self.buffer)
+        if len(self.pool) < wanted:
+            new_rows = [self.make_row() for _ in range(wanted - len(self.pool))]
+            self.pool += new_rows
+            self.bound_rows += [None] * len(new_rows)
+            self.mount_all(new_rows, before=self.bottom_spacer)
+
+        first = int(self.scroll_y // self.row_height) - self.buffer
+        first = max(0, min(first, count - wanted))
+        self.first_row = first
+        self.top_spacer.styles.height = first * self.row_height
+        self.bottom_spacer.styles.height = (count - first - wanted) * self.row_height
+
+        for offset, widget in enumerate(self.pool):
+            index = first + offset
+            if offset >= wanted:
+                widget.display = False
+                continue
+            widget.display = True
+            if self.bound_rows[offset] != index:
+                self.bind_row(widget, index)
+                self.bound_rows[offset] = index
+
+    def is_row_visible(self, index) -> bool:
+        top = int(self.scroll_y // self.row_height)
+        bottom = math.ceil((self.scroll_y + self.size.height) / self.row_height)
+        return top <= index < bottom
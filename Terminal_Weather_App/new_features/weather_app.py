@@ -1,14 +1,35 @@
 # weather_app.py
 
-import pgeocode
-import requests
+import argparse
+import asyncio
+import time
+
+from collections import namedtuple
+from functools import lru_cache
 
 from rich.text import Text
-from textual import on, work
+from textual import events, on, work
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, HorizontalGroup, VerticalScroll, Vertical
 from textual.widgets import Button, Label, Header, Input, Select
-from textual.worker import get_current_worker
+
+from dashboard_state import STATE_PATH, load_dashboard, save_dashboard
+from forecast import ForecastScheduler
+from forecast_cache import ForecastCache
+from forecast_table import ForecastColumns, ForecastTableScreen
+from geocoding import CACHE_DIR, PostalCodeResolver
+from http_client import ForecastClient
+from location_store import LocationStore
+from refresh_scheduler import RefreshScheduler
+from virtual_list import VirtualList
+
+REFRESH_INTERVAL = 3600  # seconds
+# How often to look for locations that are due for a refresh
+REFRESH_TICK = 5
+# Refresh less often when nobody has touched the app for this long
+IDLE_AFTER = 600
+# Lines taken by one Weather widget in the virtual list, margin included
+ROW_HEIGHT = 9
 
 wmo_codes = {0: "Clear sky",
              1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
@@ -41,101 +62,179 @@ wmo_to_emoji = {
     95: "thunder_cloud_and_rain", 95: "cloud_with_lightning_and_rain",
     99: "cloud_with_lightning_and_rain",}
 
+# The forecast values a Weather widget shows, days holds
+# (day, low, high, weather_code) for each of the next three days
+ForecastState = namedtuple(
+    "ForecastState",
+    ["place_name", "state_code", "temp_unit", "temperature", "weather_code", "days"])
+
+
+def forecast_state(location, weather_data, temp_unit):
+    daily = weather_data["daily"]
+    days = tuple((daily["time"][count], daily["temperature_2m_min"][count],
+                  daily["temperature_2m_max"][count], daily["weather_code"][count])
+                 for count in range(1, 4))
+    return ForecastState(location.place_name, location.state_code, temp_unit,
+                         weather_data["current"]["temperature_2m"],
+                         daily["weather_code"][0], days)
+
+
+def forecast_state_from_json(fields):
+    # JSON turns the tuples into lists, which would never compare equal
+    *values, days = fields
+    return ForecastState(*values, tuple(tuple(day) for day in days))
+
+
+@lru_cache
+def weather_text(wmo_code):
+    emoji = Text.from_markup(f":{wmo_to_emoji.get(wmo_code, 'question')}:")
+    return f"{emoji}  {wmo_codes.get(wmo_code, 'Unknown')}"
+
+
+def render_forecast(state):
+    """
+    Return the (text, style) of each label, in the order they are composed
+    """
+    temp_abbrev = "F" if state.temp_unit == "fahrenheit" else "C"
+    rendered = [
+        (f"{state.place_name}, {state.state_code}", "magenta2"),
+        (f"Current Temp: {state.temperature} {temp_abbrev}", "gold1"),
+        (f"Current Weather: {weather_text(state.weather_code)}", "gold1"),
+    ]
+    for day, low, high, wmo_code in state.days:
+        rendered += [
+            (f"{day}", "green"),
+            (f"Low: {low} {temp_abbrev} / High: {high} {temp_abbrev}", "orange3"),
+            (weather_text(wmo_code), "blue"),
+        ]
+    return rendered
+
+
 class Weather(HorizontalGroup):
 
-    def __init__(self, postal_code: str, country: str, temp_unit: str) -> None:
+    def __init__(self, postal_code: str, country: str, temp_unit: str,
+                 saved_state=None) -> None:
         super().__init__()
         self.postal_code = postal_code
         self.country = country
         self.temp_unit = temp_unit  # Fahrenheit or Celsius
+        self.state = None
+        # The forecast from the last run, shown until a fresh one arrives
+        self.saved_state = saved_state
 
-        # Update the weather once every hour
-        self.set_interval(3600, self.update_weather)
+        # Keep the labels around so a refresh doesn't have to search the DOM
+        self.placeholders = ["Location", "Current Temp", ""]
+        for weekday in range(1, 4):
+            self.placeholders += [f"Weekday +{weekday}", "Temp", "Weather"]
+        self.labels = [Label(text) for text in self.placeholders]
+        self.rendered = list(self.placeholders)
 
     def compose(self) -> ComposeResult:
-        yield Vertical(
-            Label("Location", id=f"location_{self.postal_code}"),
-            Label("Current Temp", id=f"current_temp_{self.postal_code}"),
-            Label("", id=f"wmo_{self.postal_code}"),
-        )
-        yield Vertical(
-            Label("Weekday +1", id=f"plus_one_{self.postal_code}"),
-            Label("Temp", id=f"plus_one_temp_{self.postal_code}"),
-            Label("Weather", id=f"plus_one_weather_{self.postal_code}")
-        )
-        yield Vertical(
-            Label("Weekday +2", id=f"plus_two_{self.postal_code}"),
-            Label("Temp", id=f"plus_two_temp_{self.postal_code}"),
-            Label("Weather", id=f"plus_two_weather_{self.postal_code}")
-        )
-        yield Vertical(
-            Label("Weekday +3", id=f"plus_three_{self.postal_code}"),
-            Label("Temp", id=f"plus_three_temp_{self.postal_code}"),
-            Label("Weather", id=f"plus_three_weather_{self.postal_code}")
-        )
+        for column in range(0, len(self.labels), 3):
+            yield Vertical(*self.labels[column:column + 3])
 
     def on_mount(self) -> None:
-        self.update_weather()
+        if self.saved_state is not None:
+            self.show_state(self.saved_state)
+        # The app fetches the forecasts for all the widgets together
+        self.app.schedule_weather(self, fetch_now=self.saved_state is None)
 
-    @work(exclusive=True, thread=True, group="weather")
-    def update_weather(self):
-        worker = get_current_worker()
-        nomi = pgeocode.Nominatim(self.country)
-        location = nomi.query_postal_code(self.postal_code)
-        lat = location["latitude"]
-        lon = location["longitude"]
+    def on_unmount(self) -> None:
+        self.app.unschedule_weather(self)
 
-        url = (f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,"
-               f"precipitation,rain,weather_code&daily=weather_code,temperature_2m_max,temperature_2m_min"
-               f"&temperature_unit={self.temp_unit}&timezone=America%2FChicago")
-        response = requests.get(url)
+    def update_ui(self, location, weather_data):
+        return self.show_state(forecast_state(location, weather_data, self.temp_unit))
 
-        if not worker.is_cancelled and response.status_code == 200:
-            weather_data = response.json()
-            self.app.call_from_thread(self.update_ui, location, weather_data)
+    def show_state(self, state):
+        """
+        Update only the labels whose text changed since the last refresh
 
-    def update_ui(self, location, weather_data):
-        town =  location["place_name"]
-        state_code = location["state_code"]
-        temp = weather_data["current"]["temperature_2m"]
-
-        temp_abbrev = "F" if self.temp_unit == "fahrenheit" else "C"
-
-        wmo_code = weather_data["daily"]["weather_code"][0]
-        emoji = Text.from_markup(f":{wmo_to_emoji[wmo_code]}:")
-        weather =  f"Current Weather: {emoji}  {wmo_codes[wmo_code]}"
-
-        self.app.query_one(f"#location_{self.postal_code}").update(
-            Text(f"{town}, {state_code}", style="magenta2"))
-        self.app.query_one(f"#current_temp_{self.postal_code}").update(
-            Text(f"Current Temp: {temp} {temp_abbrev}", style="gold1"))
-        self.app.query_one(f"#wmo_{self.postal_code}").update(Text(f"{weather}", style="gold1"))
-
-        # Update 3-Day forecast
-        tags = ["plus_one", "plus_two", "plus_three"]
-        count = 1
-        for tag in tags:
-            low = weather_data["daily"]["temperature_2m_min"][count]
-            high = weather_data["daily"]["temperature_2m_max"][count]
-            wmo_code = weather_data["daily"]["weather_code"][count]
-            emoji = Text.from_markup(f":{wmo_to_emoji[wmo_code]}:")
-            day = weather_data['daily']['time'][count]
-
-            self.app.query_one(f"#{tag}_{self.postal_code}").update(Text(f"{day}", style="green"))
-            self.app.query_one(f"#{tag}_temp_{self.postal_code}").update(
-                Text(f"Low: {low} {temp_abbrev} / High: {high} {temp_abbrev}", style="orange3"))
-            self.app.query_one(f"#{tag}_weather_{self.postal_code}").update(
-                Text(f"{emoji}  {wmo_codes[wmo_code]}", style="blue"))
-            count += 1
-
-        self.notify(f"Weather updated for {town} {state_code}")
+        Returns whether anything changed
+        """
+        if state == self.state:
+            return False
+        self.state = state
+        for index, (text, style) in enumerate(render_forecast(state)):
+            if self.rendered[index] != text:
+                self.labels[index].update(Text(text, style=style))
+                self.rendered[index] = text
+        return True
+
+    def clear(self):
+        self.state = None
+        for index, text in enumerate(self.placeholders):
+            if self.rendered[index] != text:
+                self.labels[index].update(text)
+                self.rendered[index] = text
+
+
+class PooledWeather(Weather):
+    """
+    A Weather widget that the virtual list binds to whichever row is on screen
+
+    The rows are scheduled by the app, not by the widget
+    """
+
+    def __init__(self, store: LocationStore) -> None:
+        super().__init__("", "", "")
+        self.store = store
+        self.index = None
+
+    def on_mount(self, event: events.Mount) -> None:
+        event.prevent_default()
+
+    def on_unmount(self, event: events.Unmount) -> None:
+        event.prevent_default()
+
+    def bind(self, index: int) -> None:
+        if self.store.bound.get(self.index) is self:
+            del self.store.bound[self.index]
+        self.index = index
+        self.store.bound[index] = self
+        self.postal_code = self.store.postal_codes[index]
+        self.country = self.store.countries[index]
+        self.temp_unit = self.store.temp_units[index]
+        state = self.store.states[index]
+        if state is None:
+            self.clear()
+        else:
+            self.show_state(state)
 
 class WeatherApp(App):
 
     CSS_PATH = "weather.tcss"
 
+    BINDINGS = [("f2", "scheduler_stats", "Scheduler stats"),
+                ("f3", "forecast_table", "Forecast table")]
+
+    country_options = [("United States", "us"), ("France", "fr")]
+
+    def __init__(self, max_concurrency: int = 8, timeout: float = 10.0,
+                 retries: int = 3, cache_path=CACHE_DIR / "forecasts.json",
+                 state_path=STATE_PATH, virtual: bool = False) -> None:
+        super().__init__()
+        self.state_path = state_path
+        # In the virtual mode the locations live in a LocationStore and
+        # only the ones on screen get a widget
+        self.virtual = virtual
+        self.store = LocationStore()
+        # Every forecast also goes into columns for the table view
+        self.forecast_columns = ForecastColumns(wmo_codes)
+        # One resolver is shared by every widget and every country
+        self.resolver = PostalCodeResolver()
+        # All the refreshes share one connection pool on the app's event loop
+        self.forecast_client = ForecastClient(max_concurrency, timeout, retries)
+        # Shorter than any refresh interval, so a scheduled refresh finds it expired
+        self.forecast_cache = ForecastCache(ttl=REFRESH_INTERVAL // 2, path=cache_path)
+        self.forecast_scheduler = ForecastScheduler(
+            self.resolver, self.forecast_client, self.forecast_cache)
+        self.refresh_scheduler = RefreshScheduler(REFRESH_INTERVAL)
+        self.pending_widgets = []
+        self.last_activity = time.monotonic()
+        self.has_focus = True
+
     def compose(self) -> ComposeResult:
-        country_options = [("United States", "us"), ("France", "fr")]
+        country_options = self.country_options
         temp_unit_options = [("Celsius", "celsius"), ("Fahrenheit", "fahrenheit")]
         yield Header()
         yield Horizontal(
@@ -145,16 +244,188 @@ class WeatherApp(App):
             Button("Add Weather", id="add_weather"),
             id="add_weather"
         )
-        yield VerticalScroll(id="vertical_scroll")
+        if self.virtual:
+            yield VirtualList(lambda: len(self.store), lambda: PooledWeather(self.store),
+                              lambda widget, index: widget.bind(index), ROW_HEIGHT,
+                              id="vertical_scroll")
+        else:
+            yield VerticalScroll(id="vertical_scroll")
+
+    async def on_mount(self) -> None:
+        self.set_interval(REFRESH_TICK, self.refresh_due)
+        self.load_postal_codes()
+        await self.restore_dashboard()
+
+    async def restore_dashboard(self) -> None:
+        """
+        Mount the saved locations with their last forecast, then refresh
+        them in the background
+        """
+        locations = load_dashboard(self.state_path) if self.state_path else []
+        if not locations:
+            return
+        states = [forecast_state_from_json(location["state"]) if location["state"] else None
+                  for location in locations]
+        if self.virtual:
+            widgets = [self.store.append(location["postal_code"], location["country"],
+                                         location["temp_unit"], state)
+                       for location, state in zip(locations, states)]
+            for row, state in zip(widgets, states):
+                self.schedule_weather(row, fetch_now=state is None)
+            self.query_one(VirtualList).update_window()
+        else:
+            widgets = [Weather(location["postal_code"], location["country"],
+                               location["temp_unit"], state)
+                       for location, state in zip(locations, states)]
+            await self.query_one("#vertical_scroll").mount_all(widgets)
+        # Once they are laid out, we know which ones are on screen
+        self.call_after_refresh(self.refresh_restored, widgets)
+
+    def refresh_restored(self, widgets) -> None:
+        visible = [widget for widget in widgets if self.is_visible(widget)]
+        hidden = [widget for widget in widgets if widget not in visible]
+        self.refresh_forecasts(visible, hidden)
+
+    def save_dashboard(self) -> None:
+        if not self.state_path:
+            return
+        widgets = self.store.rows if self.virtual else self.query(Weather)
+        locations = [{"postal_code": widget.postal_code, "country": widget.country,
+                      "temp_unit": widget.temp_unit, "state": widget.state}
+                     for widget in widgets]
+        save_dashboard(self.state_path, locations)
+
+    @work(thread=True, group="geocoding", exit_on_error=False)
+    def load_postal_codes(self) -> None:
+        # Warm up the postal code tables so the first lookup is instant
+        for _, country in self.country_options:
+            try:
+                self.resolver.load(country)
+            except Exception as error:
+                # Offline on the first run, say; the lookup is tried again
+                # when a location is added
+                self.call_from_thread(
+                    self.notify, f"Could not load the {country} postal codes: {error}",
+                    severity="warning")
+
+    def schedule_weather(self, widget, fetch_now: bool = True) -> None:
+        """
+        Register a newly mounted widget and fetch its forecast
+
+        Widgets mounted close together are collected for a moment
+        so they share one request. Restored widgets are refreshed by
+        refresh_restored() instead.
+        """
+        self.forecast_scheduler.register(widget)
+        self.refresh_scheduler.add(widget)
+        if not fetch_now:
+            return
+        if not self.pending_widgets:
+            self.set_timer(0.2, self.refresh_pending)
+        self.pending_widgets.append(widget)
+
+    def unschedule_weather(self, widget) -> None:
+        self.forecast_scheduler.unregister(widget)
+        self.refresh_scheduler.remove(widget)
+
+    def refresh_pending(self) -> None:
+        widgets, self.pending_widgets = self.pending_widgets, []
+        self.refresh_forecasts(widgets)
+
+    def is_visible(self, widget) -> bool:
+        if self.virtual:
+            return self.query_one(VirtualList).is_row_visible(widget.index)
+        # Widgets scrolled out of view have no region on the screen
+        return self.query_one("#vertical_scroll").region.overlaps(widget.region)
+
+    def refresh_due(self) -> None:
+        idle = time.monotonic() - self.last_activity > IDLE_AFTER
+        self.refresh_scheduler.idle = idle or not self.has_focus
+        widgets = self.refresh_scheduler.due(self.is_visible)
+        if widgets:
+            self.refresh_forecasts(widgets)
+
+    @work(group="forecast")
+    async def refresh_forecasts(self, *groups) -> None:
+        """
+        Fetch the forecasts for each group of widgets in turn
+        """
+        start = time.perf_counter()
+        requests_before = self.forecast_scheduler.request_count
+        updated = 0
+        for widgets in groups:
+            updated += await self.update_forecasts(widgets)
+
+        self.sub_title = self.forecast_cache.stats()
+        if updated:
+            elapsed = time.perf_counter() - start
+            request_count = self.forecast_scheduler.request_count - requests_before
+            self.notify(f"Weather updated for {updated} locations "
+                        f"({request_count} requests, {elapsed:.2f}s)")
+            await asyncio.to_thread(self.forecast_cache.save)
+            self.save_dashboard()
+
+    async def update_forecasts(self, widgets) -> int:
+        if not widgets:
+            return 0
+        results = await self.forecast_scheduler.fetch_all(widgets)
+        self.forecast_columns.ingest(results)
+        updated = set()
+        for widget, location, weather_data in results:
+            # The widget may have been removed while its forecast was in flight
+            if widget.is_attached:
+                changed = widget.show_state(
+                    forecast_state(location, weather_data, widget.temp_unit))
+                self.refresh_scheduler.done(widget, changed)
+                updated.add(widget)
+        # Failed fetches get another try after the usual interval
+        for widget in widgets:
+            if widget not in updated:
+                self.refresh_scheduler.done(widget)
+        return len(updated)
+
+    async def on_unmount(self) -> None:
+        await self.forecast_client.aclose()
+
+    async def on_event(self, event: events.Event) -> None:
+        if isinstance(event, events.InputEvent):
+            self.last_activity = time.monotonic()
+        await super().on_event(event)
+
+    def on_app_focus(self) -> None:
+        self.has_focus = True
+
+    def on_app_blur(self) -> None:
+        self.has_focus = False
+
+    def action_forecast_table(self) -> None:
+        self.push_screen(ForecastTableScreen(self.forecast_columns))
+
+    def action_scheduler_stats(self) -> None:
+        next_runs = [f"{widget.postal_code} in {seconds / 60:.0f} min (x{backoff})"
+                     for widget, seconds, backoff in self.refresh_scheduler.next_runs()[:5]]
+        self.notify("\n".join([f"Queue depth: {self.refresh_scheduler.queue_depth()}",
+                               *next_runs]),
+                    title="Refresh scheduler")
 
     @on(Button.Pressed, "#add_weather")
     def on_weather_added(self) -> None:
         postal_code = self.query_one("#postal_code", Input).value
         country = self.query_one("#country").value
         temp_unit = self.query_one("#temp_unit").value
-        if postal_code:
+        if not postal_code:
+            return
+        if self.virtual:
+            self.schedule_weather(self.store.append(postal_code, country, temp_unit))
+            self.query_one(VirtualList).update_window()
+        else:
             self.query_one("#vertical_scroll").mount(Weather(postal_code, country, temp_unit))
+        self.call_after_refresh(self.save_dashboard)
 
 if __name__ == "__main__":
-    app = WeatherApp()
+    parser = argparse.ArgumentParser(description="Weather in your terminal")
+    parser.add_argument("--virtual", action="store_true",
+                        help="only create widgets for the locations on screen")
+    args = parser.parse_args()
+    app = WeatherApp(virtual=args.virtual)
     app.run()
@@ -0,0 +1,280 @@
+# weather_cli.py
+
+"""
+Fetch forecasts for a file of postal codes without the TUI
+
+Each line of the input file is a postal code, optionally followed by
+a country and a temperature unit:
+
+    60601
+    75001,fr,celsius
+
+Results are written as JSON Lines or CSV in input order as soon as
+they arrive. A checkpoint next to the output file records how many
+input lines are done, so an interrupted run picks up where it stopped:
+
+    python weather_cli.py postal_codes.txt -o forecasts.jsonl
+    python weather_cli.py postal_codes.txt -o forecasts.csv --format csv
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+from collections import namedtuple
+
+from rich.emoji import Emoji
+
+from forecast import MAX_BATCH_SIZE, ForecastScheduler
+from forecast_cache import ForecastCache
+from geocoding import PostalCodeResolver
+from http_client import ForecastClient
+from weather_app import forecast_state, wmo_codes, wmo_to_emoji
+
+Row = namedtuple("Row", ["line_number", "postal_code", "country", "temp_unit"])
+
+CSV_FIELDS = ["postal_code", "country", "place_name", "state_code", "temp_unit",
+              "temperature", "weather", "emoji", "error"]
+for day in range(1, 4):
+    CSV_FIELDS += [f"day{day}_date", f"day{day}_low", f"day{day}_high", f"day{day}_weather"]
+
+
+def read_rows(path, country, temp_unit, skip_lines=0):
+    """
+    Yield a Row for each postal code in the file, one line at a time
+    """
+    with open(path, encoding="utf-8") as input_file:
+        for line_number, line in enumerate(input_file, start=1):
+            if line_number <= skip_lines:
+                continue
+            fields = [field.strip() for field in line.split(",")]
+            if not fields[0]:
+                continue
+            yield Row(line_number, fields[0],
+                      fields[1] if len(fields) > 1 and fields[1] else country,
+                      fields[2] if len(fields) > 2 and fields[2] else temp_unit)
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def emoji(wmo_code):
+    return Emoji.replace(f":{wmo_to_emoji.get(wmo_code, 'question')}:")
+
+
+def to_record(row, location=None, weather_data=None, error=None):
+    """
+    Turn a fetched forecast into a flat record for the output file
+    """
+    record = {"postal_code": row.postal_code, "country": row.country,
+              "temp_unit": row.temp_unit}
+    if error:
+        record["error"] = error
+        return record
+
+    state = forecast_state(location, weather_data, row.temp_unit)
+    record.update(place_name=state.place_name, state_code=state.state_code,
+                  temperature=state.temperature,
+                  weather=wmo_codes.get(state.weather_code, "Unknown"),
+                  emoji=emoji(state.weather_code))
+    record["days"] = [{"date": day, "low": low, "high": high,
+                       "weather": wmo_codes.get(wmo_code, "Unknown")}
+                      for day, low, high, wmo_code in state.days]
+    return record
+
+
+def describe(error):
+    return f"{type(error).__name__}: {error}"
+
+
+def locate_rows(scheduler, batch):
+    """
+    Look up the rows one at a time, so one bad row can't fail the batch
+
+    Returns the (row, location) pairs and a dict of row -> error
+    """
+    located = []
+    errors = {}
+    for row in batch:
+        try:
+            located += scheduler.locate([row])
+        except Exception as error:
+            # An unsupported country, or its table couldn't be downloaded
+            errors[row] = describe(error)
+    return located, errors
+
+
+async def process_batch(scheduler, batch):
+    located, errors = await asyncio.to_thread(locate_rows, scheduler, batch)
+    try:
+        fetched = await scheduler.fetch_all(located=located)
+    except Exception as error:
+        fetched = []
+        errors.update((row, describe(error)) for row, _ in located)
+    results = {row: (location, weather_data) for row, location, weather_data in fetched}
+    located = {row for row, _ in located}
+    records = []
+    for row in batch:
+        if row in errors:
+            records.append(to_record(row, error=errors[row]))
+        elif row in results:
+            records.append(to_record(row, *results[row]))
+        elif row in located:
+            records.append(to_record(row, error="forecast not available"))
+        else:
+            records.append(to_record(row, error="unknown postal code"))
+    return records
+
+
+class JSONLinesWriter:
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+
+    def write(self, record):
+        self.output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class CSVWriter:
+
+    def __init__(self, output_file):
+        self.writer = csv.DictWriter(output_file, fieldnames=CSV_FIELDS)
+        if output_file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, record):
+        record = dict(record)
+        for day, forecast in enumerate(record.pop("days", []), start=1):
+            for field, value in forecast.items():
+                record[f"day{day}_{field}"] = value
+        self.writer.writerow(record)
+
+
+def load_checkpoint(path, input_path):
+    try:
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return 0
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        return 0
+    return checkpoint.get("lines_done", 0)
+
+
+def save_checkpoint(path, input_path, lines_done):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as checkpoint_file:
+        json.dump({"input": os.path.abspath(input_path), "lines_done": lines_done},
+                  checkpoint_file)
+    os.replace(tmp_path, path)
+
+
+async def run(args):
+    checkpoint_path = f"{args.output}.checkpoint" if args.output != "-" else None
+    lines_done = 0
+    if checkpoint_path and not args.restart:
+        lines_done = load_checkpoint(checkpoint_path, args.input)
+    if lines_done:
+        print(f"Resuming after line {lines_done}", file=sys.stderr)
+
+    if args.output == "-":
+        output_file = sys.stdout
+    else:
+        mode = "a" if lines_done else "w"
+        output_file = open(args.output, mode, encoding="utf-8", newline="")
+    writer = CSVWriter(output_file) if args.format == "csv" else JSONLinesWriter(output_file)
+
+    rows = read_rows(args.input, args.country, args.unit, lines_done)
+    written = errors = 0
+    start = time.perf_counter()
+
+    # The cache only needs to dedupe nearby locations, so keep it small
+    cache = ForecastCache(max_entries=args.batch_size * args.concurrency * 4)
+    async with ForecastClient(max_concurrency=args.concurrency, timeout=args.timeout,
+                              retries=args.retries) as client:
+        scheduler = ForecastScheduler(PostalCodeResolver(), client, cache, args.batch_size)
+
+        # Batches finish in any order but are written in input order, so
+        # the checkpoint is always exact. At most `concurrency` batches are
+        # held in memory at once.
+        pending = {}
+        finished = {}
+        next_batch = 0
+        batch_ends = {}
+
+        def write_finished():
+            nonlocal next_batch, written, errors, lines_done
+            while next_batch in finished:
+                for record in finished.pop(next_batch):
+                    writer.write(record)
+                    written += 1
+                    errors += "error" in record
+                output_file.flush()
+                lines_done = batch_ends.pop(next_batch)
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, args.input, lines_done)
+                next_batch += 1
+
+        async def wait_for_batches(limit):
+            while len(pending) > limit:
+                done, _ = await asyncio.wait(pending.values(),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for index, task in list(pending.items()):
+                    if task in done:
+                        finished[index] = task.result()
+                        del pending[index]
+                write_finished()
+                elapsed = time.perf_counter() - start
+                print(f"\r{written} rows, {written / elapsed:.1f} rows/s",
+                      end="", file=sys.stderr)
+
+        for index, batch in enumerate(batched(rows, args.batch_size)):
+            batch_ends[index] = batch[-1].line_number
+            pending[index] = asyncio.create_task(process_batch(scheduler, batch))
+            await wait_for_batches(args.concurrency - 1)
+        await wait_for_batches(0)
+
+    if output_file is not sys.stdout:
+        output_file.close()
+
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(f"{written} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.1f} rows/s), "
+          f"{errors} errors, {scheduler.request_count} requests, {cache.stats()}",
+          file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch forecasts for a file of postal codes")
+    parser.add_argument("input", help="file with one postal code per line")
+    parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--country", default="us", help="country when a line doesn't say")
+    parser.add_argument("--unit", default="fahrenheit", choices=["celsius", "fahrenheit"],
+                        help="temperature unit when a line doesn't say")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help="locations per forecast request")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="forecast requests in flight at once")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint and start from the beginning")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()